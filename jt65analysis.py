@@ -28,7 +28,6 @@ import csv
 import jt65stego
 import jt65wrapy
 import numpy as np
-import matplotlib.pyplot as plt
 
 distancedict = {}
 
@@ -134,9 +133,8 @@ def checkpacket(packet, verbose=False):
     symbols = packet[0]
     confidence = packet[1]
 
-    symboltrydecode = copy.deepcopy(symbols)
-    testdecode = jt65wrapy.unprepmsg(symboltrydecode)
-    realmessage = jt65wrapy.prepmsg(testdecode)
+    testdecode, nerr = jt65wrapy.unprepmsg_batch(symbols, confidence)
+    realmessage = jt65wrapy.symbolcache.frompayload(testdecode[0])
     symbolmap = map(eq, realmessage, symbols)
 
     diffs = []
@@ -190,11 +188,11 @@ def output(diffs, packet, distances=False, distancegrid="", homelatlon=[]):
             diffdist += abs(dif[1] - dif[2])
         print str(len(diffs)) + ", " + str(conftotal) + ", " + str(float(conftotal) / float(len(diffs))) + ", " + str(np.median(col(diffs, 3))) +  \
             ", " + str(np.std(col(diffs, 3))) + ", " + str(diffdist / len(diffs)) + ", " + str(np.sum(packet[1])) + ", " + str(np.average(packet[1])) + \
-            ", " + str(np.median(packet[1])) + ", " + str(np.std(packet[1])) + ", " + str(mad(col(diffs, 3))) + ", " + str(mad(packet[1])) + ", " + packet[3] + ", " + packet[4] + ", " + packet[5] + ", " + \
-            packet[6] + ", " + str(distance) + ", " + str(snr) + ", " + packet[2]
+            ", " + str(np.median(packet[1])) + ", " + str(np.std(packet[1])) + ", " + str(mad(col(diffs, 3))) + ", " + str(mad(packet[1])) + ", " + str(packet[3]) + ", " + str(packet[4]) + ", " + str(packet[5]) + ", " + \
+            str(packet[6]) + ", " + str(distance) + ", " + str(snr) + ", " + packet[2]
     else:
         print "0, 0, 0, 0, 0, 0, " + str(np.sum(packet[1])) + ", " + str(np.average(packet[1])) + ", " + str(np.median(packet[1])) + ", " + \
-            str(np.std(packet[1])) + ", " + "0 " + ", " + str(mad(packet[1])) + ", " + packet[3] + ", " + packet[4] + ", " + packet[5] + ", " + packet[6] + ", " + str(distance) + ", " + \
+            str(np.std(packet[1])) + ", " + "0 " + ", " + str(mad(packet[1])) + ", " + str(packet[3]) + ", " + str(packet[4]) + ", " + str(packet[5]) + ", " + str(packet[6]) + ", " + str(distance) + ", " + \
             str(snr) + ", " + packet[2]
 
 
@@ -219,6 +217,8 @@ def processtextfile(filename, threshold=7):
     print "Average SNR:					" + str(np.average(snrcol))
     print "Standard Deviation SNR:				" + str(np.std(snrcol))
 
+    import matplotlib.pyplot as plt  # only needed for these plots, keeps the other modes fast to start
+
     errorplot = plt.figure()
     errorplot.suptitle('Error Histogram', fontsize=14, fontweight='bold')
     axerror = errorplot.add_subplot(111)
@@ -339,8 +339,7 @@ def binpacketsbyerror(packets, verbose=False, errormax=26, errormin=0):
                 print "CRITICAL EXCEPTION BIN " + str(i)
                 print rangepacket
                 print diffs
-            rangepacket.append(diffs)
-            returnbins[i].append(rangepacket)
+            returnbins[i].append(list(rangepacket) + [diffs])
     if verbose:
         print "bin: " + str(i)
         print "packets: " + str(len(returnbins[i]))
@@ -356,15 +355,15 @@ def signalbins(packets, verbose=False):
     errorsymbols = [0] * 64
     locations = [0] * 63
     for packet in packets:
-        packet.append(checkpacket(packet, verbose))
+        diffs = checkpacket(packet, verbose)
         packetsymbols = np.bincount(packet[0], None, 64)
         symbols = np.add(symbols, packetsymbols)
 
-        if len(packet[7]):
+        if len(diffs):
 
-            packeterrorsymbols = np.bincount(col(packet[7], 1), None, 64)
+            packeterrorsymbols = np.bincount(col(diffs, 1), None, 64)
             errorsymbols = np.add(errorsymbols, packeterrorsymbols)
-            packetlocations = np.bincount(col(packet[7], 0), None, 63)
+            packetlocations = np.bincount(col(diffs, 0), None, 63)
             locations = np.add(locations, packetlocations)
 
     return symbols, errorsymbols, locations
@@ -378,9 +377,8 @@ def getgoodconfidence(packets, verbose=False):
         symbols = packet[0]
         confidence = packet[1]
 
-        symboltrydecode = copy.deepcopy(symbols)
-        testdecode = jt65wrapy.unprepmsg(symboltrydecode)
-        realmessage = jt65wrapy.prepmsg(testdecode)
+        testdecode, nerr = jt65wrapy.unprepmsg_batch(symbols, confidence)
+        realmessage = jt65wrapy.symbolcache.frompayload(testdecode[0])
         symbolmap = map(eq, realmessage, symbols)
 
         for i in range(0, 63):
@@ -428,22 +426,24 @@ def simulateerrors(packet, diffs, numerrors, verbose=False):
 
 def simulatespecific(packet, population, errors, verbose=False):
 # simulate a packet's confidence and errors from the population of packets
+# packet and the population can be jt65wrapy.DECODE_DTYPE records or binpacketsbyerror packets
+# returns a packet list like binpacketsbyerror with the simulated diffs as element 7
 
     simpacket = random.choice(population)
-    if len(simpacket[7]) != errors:
+    simdiffs = simpacket[7] if len(simpacket) > 7 else checkpacket(simpacket, verbose)
+    if len(simdiffs) != errors:
         print "SIMULATESPECIFIC: simpacket has different diffs than errors - This probably isn't what you want"
     if verbose:
         print packet
         print simpacket
-    retpacket = copy.deepcopy(packet)
-    retpacket[1] = simpacket[1]
+    retpacket = copy.deepcopy(list(packet)[:7]) + [simdiffs]
+    retpacket[1] = copy.deepcopy(simpacket[1])
     retpacket[3] = simpacket[3]
     retpacket[4] = simpacket[4]
     retpacket[5] = simpacket[5]
     retpacket[6] = simpacket[6]
-    retpacket[7] = simpacket[7]
 
-    for diff in simpacket[7]:
+    for diff in simdiffs:
         retpacket[0][diff[0]] = diff[1]
         retpacket[1][diff[0]] = diff[3]
     if verbose:
@@ -452,8 +452,8 @@ def simulatespecific(packet, population, errors, verbose=False):
 
 
 def readsimwav(filename):
-# reads in a text file that simulates the output of ./jt65 to build an
-# array of packets
+# reads in a text file that simulates the output of ./jt65 to build a
+# jt65wrapy.DECODE_DTYPE structured array of packets like jt65wrapy.decodewav
     messages = []
     symbols = []
     confidence = []
@@ -481,9 +481,9 @@ def readsimwav(filename):
                 a1 = "0"
                 a2 = "0"
             messages.append(
-                [symbols, confidence, jt65msg.strip(), s2db.strip(), freq.strip(), a1.strip(), a2.strip()])
+                (symbols, confidence, jt65msg.strip(), float(s2db), float(freq), float(a1), float(a2)))
             linecount = linecount - 3
-    return messages
+    return np.array(messages, dtype=jt65wrapy.DECODE_DTYPE)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,413 @@
+#!/usr/bin/env python
+#
+# Throughput benchmarks for the JT65 steganography tools
+#
+# Copyright 2014 - Paul Drapeau and Brent Dukes
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import argparse
+import io
+import os
+import math
+import random
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import timeit
+from multiprocessing.pool import ThreadPool
+import numpy as np
+import jt65wrapy as jt
+import jt65stego as jts
+import jt65codec
+import jt65sound
+
+STARTUP_MODULES = ["jt65wrapy", "jt65sound", "jt65stego", "jt65analysis"]  # what the tools import at startup
+LAZY_MODULES = ["Crypto", "gnupg", "matplotlib", "colorama", "jt65soundlookup"]  # must only load when used
+
+BENCH_MESSAGES = ["KB2BBC KA1AAB DD44", "KA1AAB KB2BBC DD44", "CQ K1JT FN20",
+                  "K1JT KA1AAB -21", "KA1AAB K1JT R-19", "K1JT KA1AAB 73"]
+
+
+def timed(func, repeat=3):
+# returns the best wall clock time in seconds of repeat calls to func
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def report(name, count, seconds):
+# formated output for a single benchmark result
+    print name + " : " + str(count) + " in " + "%.4f" % seconds + " s (" + "%.0f" % (count / seconds) + " per second)"
+
+
+def reportspeedup(slow, fast):
+    print "speedup : " + "%.1f" % (slow / fast) + "x\n"
+
+
+def benchmessages(count):
+# returns a list of count JT65 messages cycling through BENCH_MESSAGES
+    return [BENCH_MESSAGES[i % len(BENCH_MESSAGES)] for i in range(count)]
+
+
+def legacyrandomcover(message, howmuch):
+# the random.randint retry loops randomcover used before randomcover_batch
+    locs = []
+    while len(locs) < howmuch:
+        loc = random.randint(0, 62)
+        while loc in locs:
+            loc = random.randint(0, 62)
+        locs.append(loc)
+        coverint = random.randint(0, 63)
+        while coverint == message[loc]:
+            coverint = random.randint(0, 63)
+        message[loc] = coverint
+    return message
+
+
+def benchcover(count):
+# cover noise added packet by packet by the old retry loops versus one randomcover_batch call
+    packets = np.array(jts.jt65encodemessages(benchmessages(count)))
+
+    looptime = timed(lambda: [legacyrandomcover(packet, 10) for packet in packets.copy()])
+    batchtime = timed(lambda: jts.randomcover_batch(packets, 10, 0))
+
+    report("randomint retry loops", count, looptime)
+    report("randomcover_batch", count, batchtime)
+    reportspeedup(looptime, batchtime)
+
+
+def benchencode(count):
+# per message encode/prepmsg loop versus encode_batch/prepmsg_batch
+    msgs = benchmessages(count)
+
+    looptime = timed(lambda: [jt.prepmsg(jt.encode(msg)) for msg in msgs])
+    batchtime = timed(lambda: jt.prepmsg_batch(jt.encode_batch(msgs)))
+
+    report("encode/prepmsg loop", count, looptime)
+    report("encode_batch/prepmsg_batch", count, batchtime)
+    reportspeedup(looptime, batchtime)
+
+
+def benchcodec(count):
+# JT65 module batch prep/unprep versus the pure NumPy jt65codec, one in ten packets has 3 errors
+    packets = jt.prepmsg_batch(jt.encode_batch(benchmessages(count)))
+    received = packets.copy()
+    rows = np.arange(0, count, 10)
+    for position in (3, 30, 60):
+        received[rows, position] = (received[rows, position] + 1) % 64
+
+    modtime = timed(lambda: jt.unprepmsg_batch(jt.prepmsg_batch(jt.unprepmsg_batch(received)[0])))
+    codectime = timed(lambda: jt65codec.unprepmsg_batch(jt65codec.prepmsg_batch(jt65codec.unprepmsg_batch(received)[0])))
+
+    report("JT65 unprep/prep/unprep", count, modtime)
+    report("jt65codec unprep/prep/unprep", count, codectime)
+    reportspeedup(modtime, codectime)
+
+
+def benchcache(count):
+# validatesteg style re-encoding of repeated messages with and without jt65wrapy.symbolcache
+    msgs = benchmessages(count)
+    cache = jt.SymbolCache()
+
+    looptime = timed(lambda: [jt.prepmsg(jt.encode(msg)) for msg in msgs])
+    cachetime = timed(lambda: [cache.frommessage(msg) for msg in msgs])
+
+    report("prepmsg(encode()) loop", count, looptime)
+    report("symbolcache.frommessage", count, cachetime)
+    reportspeedup(looptime, cachetime)
+
+
+def benchsteg(count):
+# steginject/retrievesteg through the batch scatter/gather versus a per packet jtsteg/jtunsteg loop
+    packets = jt.prepmsg_batch(jt.encode_batch(benchmessages(count)))
+    stegdata = np.random.RandomState(0).randint(0, 64, (count, 20)).astype(np.int32)
+    hidekey = jts.getnoisekey("benchmark")
+
+    looptime = timed(lambda: [jts.jtunsteg(jts.jtsteg(packet, steg, hidekey), hidekey)
+                              for packet, steg in zip(packets, stegdata)])
+    batchtime = timed(lambda: jts.retrievesteg(jts.steginject(packets, 0, stegdata, hidekey), hidekey))
+
+    report("jtsteg/jtunsteg loop", count, looptime)
+    report("steginject/retrievesteg", count, batchtime)
+    reportspeedup(looptime, batchtime)
+
+
+def benchrepack(count):
+# per packet jt65tobytes/bytestojt65 versus the batch bit permutation repacking
+    symbols = np.random.RandomState(0).randint(0, 64, (count, 12))
+
+    looptime = timed(lambda: [jts.bytestojt65(jts.jt65tobytes(msg)) for msg in symbols])
+    batchtime = timed(lambda: jts.bytestojt65_batch(jts.jt65tobytes_batch(symbols)))
+
+    report("jt65tobytes/bytestojt65 loop", count, looptime)
+    report("jt65tobytes_batch/bytestojt65_batch", count, batchtime)
+    reportspeedup(looptime, batchtime)
+
+
+def legacyreassemble(stegbytes):
+# the np.append and hex round trip reassembly deciphersteg used before reassemblesteg
+    stegedmsgba = np.array(range(0), dtype=np.int32)
+    for thesebytes in stegbytes:
+        stegedmsgba = np.append(stegedmsgba, thesebytes[1:10])
+    return ''.join('{0:02x}'.format(int(e)).decode("hex") for e in stegedmsgba)
+
+
+def benchreassemble(count):
+# reassembly of maximum size AES/GPG messages (128 packets each, both ciphers share the same
+# reassembly) from unprepped steg packets
+    packets = jts.MAX_MULTI_PACKET_STEG_BYTES_AES / 8
+    messages = max(1, count / packets)
+    status = [0x80 | packets] + range(1, packets)
+    cipherbytes = np.random.RandomState(0).randint(0, 256, (messages, packets, 8))
+    stegdata = [jts.bytes8tojt65_batch(message, status) for message in cipherbytes]
+    stegbytes = [jts.jt65tobytes_batch(message) for message in stegdata]
+
+    if [str(jts.reassemblesteg(message, "AES")) for message in stegdata] != \
+            [legacyreassemble(message) for message in stegbytes]:
+        print "reassemblesteg does not match the np.append/hex reassembly"
+        sys.exit(0)
+
+    looptime = timed(lambda: [legacyreassemble(message) for message in stegbytes])
+    buffertime = timed(lambda: [jts.reassemblesteg(message, "AES") for message in stegdata])
+
+    report("np.append/hex reassembly (packets)", messages * packets, looptime)
+    report("reassemblesteg (packets)", messages * packets, buffertime)
+    reportspeedup(looptime, buffertime)
+
+
+def benchciphers(count):
+# deciphering ARC4 and AES CBC messages with the cipher object made for every message
+# (as the cipher chains did before getcipher) versus the one getcipher keeps per key
+    messages = max(1, count / 4)
+    arc4msgs = jts.createciphermsgs(4, "DEFCONFTW" * 3, "ARC4", "PDOGGTHEDUKEZIP", None, "ECB")
+    aesmsgs = jts.createciphermsgs(4, "DEFCONFTW", "AES", "PDOGGTHEDUKEZIP1", None, "CBC")
+    stegdata = [jt.unprepsteg_batch(arc4msgs)[0], jt.unprepsteg_batch(aesmsgs)[0]]
+
+    def decipher(fresh):
+        for i in range(messages):
+            if fresh:
+                jts.cipherobjs.clear()
+            jts.deciphersteg(stegdata[0], "ARC4", "PDOGGTHEDUKEZIP", "ECB", False, False)
+            jts.deciphersteg(stegdata[1], "AES", "PDOGGTHEDUKEZIP1", "CBC", False, False)
+
+    freshtime = timed(lambda: decipher(True))
+    reusedtime = timed(lambda: decipher(False))
+
+    report("cipher per message (packets)", messages * 8, freshtime)
+    report("cipher per key (packets)", messages * 8, reusedtime)
+    reportspeedup(freshtime, reusedtime)
+
+
+def benchgpg(count):
+# decrypting count / 100 GPG messages with a new GPG handle per message (as before
+# GPGSession) versus one session
+# uses a throwaway keyring with a key made for the benchmark
+    from gnupg import GPG
+    messages = max(2, count / 100)
+    home = tempfile.mkdtemp()
+    try:
+        session = jts.GPGSession(home)
+        session.gpg.gen_key(session.gpg.gen_key_input(key_type="RSA", key_length=1024,
+                                                      name_email="bench@example.com", no_protection=True))
+        cipherdatas = [session.encrypt("DEFCONFTW %d" % i, "bench@example.com") for i in range(messages)]
+
+        newtime = timed(lambda: [str(GPG(gnupghome=home).decrypt(data)) for data in cipherdatas])
+        sessiontime = timed(lambda: [session.decrypt(data) for data in cipherdatas])
+
+        report("GPG per message", messages, newtime)
+        report("GPGSession.decrypt", messages, sessiontime)
+        reportspeedup(newtime, sessiontime)
+    finally:
+        subprocess.call(["gpgconf", "--homedir", home, "--kill", "gpg-agent"])
+        shutil.rmtree(home)
+
+
+def benchscreen(count):
+# steg detection with decodemessages/validatesteg per packet versus one screensteg call
+# every packet is a different message so the symbol cache does not help validatesteg
+    payloads = np.random.RandomState(0).randint(0, 64, (count, 12)).astype(np.int32)
+    packets = jt.prepmsg_batch(jt.encode_batch([jt.decode(payload) for payload in payloads]))
+    hidekey = jts.getnoisekey("benchmark")
+    packets[::2, hidekey.positions[:17]] = (packets[::2, hidekey.positions[:17]] + 1) % 64
+
+    def validateloop():
+        jt.symbolcache.clear()
+        jt65msgs = jts.decodemessages(packets)
+        return [jts.validatesteg(jt65msgs[i], packets[i], hidekey, 17) for i in range(count)]
+
+    looptime = timed(validateloop)
+    screentime = timed(lambda: jts.screensteg(packets, hidekey)[1] >= 17)
+
+    report("decodemessages/validatesteg", count, looptime)
+    report("screensteg", count, screentime)
+    reportspeedup(looptime, screentime)
+
+
+def benchthreads(count):
+# unprepmsg_batch throughput with the packets split over 1, 2 and 4 threads
+# the JT65 module releases the GIL so this scales with the number of cores
+    packets = jt.prepmsg_batch(jt.encode_batch(benchmessages(count)))
+    chunks = np.array_split(packets, 16)
+
+    serialtime = None
+    for threads in (1, 2, 4):
+        pool = ThreadPool(threads)
+        threadtime = timed(lambda: pool.map(jt.unprepmsg_batch, chunks))
+        pool.close()
+        pool.join()
+        report("unprepmsg_batch " + str(threads) + " thread(s)", count, threadtime)
+        serialtime = serialtime or threadtime
+    reportspeedup(serialtime, threadtime)
+
+
+def legacytonesamples(tones, data_size, frate):
+# the math.sin and struct.pack per sample loop outputwavfile used before symbolsamples
+    amp = 1000.0
+    framerate = int(frate)
+    packed_zeros = struct.pack('h', int(0))
+    values = [packed_zeros] * framerate
+    for index in range(0, 126):
+        for x in range(data_size):
+            values.append(struct.pack('h', int(math.sin(2 * math.pi * tones[index] * (x / frate)) * amp / 2)))
+    values += [packed_zeros] * ((framerate * 59) - (126 * data_size))
+    return ''.join(values)
+
+
+def benchwav(count):
+# one minute of WSJT-X audio (count / 5000 of them) from the per sample loop versus outputwavfile
+# writing the wav file to memory
+    minutes = max(1, count / 5000)
+    tones = jt65sound.toneswithsync(jt.prepmsg(jt.encode(BENCH_MESSAGES[0])))
+
+    looptime = timed(lambda: [legacytonesamples(tones, 4464, 12000.0) for i in range(minutes)])
+    arraytime = timed(lambda: [jt65sound.outputwavfile(io.BytesIO(), tones).getvalue() for i in range(minutes)])
+
+    report("math.sin/struct.pack loop (minutes)", minutes, looptime)
+    report("outputwavfile (minutes)", minutes, arraytime)
+    reportspeedup(looptime, arraytime)
+
+
+def benchwavfiles(count):
+# JT65B WSJT wav files at an offset (count / 1000 of them) from outputwavfile versus
+# outputwavfilequick with the tone table cached after the first file
+    files = max(2, count / 1000)
+    packets = jt.prepmsg_batch(jt.encode_batch(benchmessages(files)))
+    workdir = tempfile.mkdtemp()
+    filename = os.path.join(workdir, "bench.wav")
+    try:
+        def synthesize():
+            for packet in packets:
+                jt65sound.outputwavfile(filename, jt65sound.toneswithsync(packet, 2, 100.0), 0)
+
+        def quick():
+            jt65sound.tonetables.clear()
+            for packet in packets:
+                jt65sound.outputwavfilequick(filename, packet, 2, 100.0, 0)
+
+        synthesizetime = timed(synthesize)
+        quicktime = timed(quick)
+    finally:
+        shutil.rmtree(workdir)
+
+    report("outputwavfile (files)", files, synthesizetime)
+    report("outputwavfilequick (files)", files, quicktime)
+    reportspeedup(synthesizetime, quicktime)
+
+
+def benchrender(count):
+# rendering count / 500 WSJT-X wav files with outputwavfiles on 1, 2 and 4 worker processes
+    files = max(4, count / 500)
+    packets = jt.prepmsg_batch(jt.encode_batch(benchmessages(files)))
+    workdir = tempfile.mkdtemp()
+    filenames = [os.path.join(workdir, "bench-" + str(index).zfill(3) + ".wav") for index in range(files)]
+    try:
+        serialtime = None
+        for workers in (1, 2, 4):
+            rendertime = timed(lambda: list(jt65sound.outputwavfiles(filenames, packets, workers=workers)))
+            report("outputwavfiles " + str(workers) + " worker(s) (files)", files, rendertime)
+            serialtime = serialtime or rendertime
+    finally:
+        shutil.rmtree(workdir)
+    reportspeedup(serialtime, rendertime)
+
+
+def benchworkers(count):
+# jt65encodemessages_stream throughput with 1, 2 and 4 worker processes
+# on 10 times count messages, at least one for every minute of a day
+    msgs = benchmessages(max(count * 10, 1440))
+
+    serialtime = None
+    for workers in (1, 2, 4):
+        workertime = timed(lambda: sum(1 for packet in jts.jt65encodemessages_stream(msgs, workers=workers)))
+        report("jt65encodemessages_stream " + str(workers) + " worker(s)", len(msgs), workertime)
+        serialtime = serialtime or workertime
+    reportspeedup(serialtime, workertime)
+
+
+def benchstartup(count):
+# cold import time of the modules behind each tool, each one in a fresh interpreter
+# any module that should be imported lazily but was loaded is reported as a regression
+    check = "import sys\nprint ' '.join(sorted(set(name.split('.')[0] for name in sys.modules) & set(%r)))"
+    basetime = timed(lambda: subprocess.check_call([sys.executable, "-c", "pass"]))
+    print "python startup : " + "%.1f" % (basetime * 1000) + " ms"
+
+    for module in STARTUP_MODULES:
+        code = "import " + module + "\n" + check % LAZY_MODULES
+        importtime = timed(lambda: subprocess.check_output([sys.executable, "-c", code])) - basetime
+        print "import " + module + " : " + "%.1f" % (importtime * 1000) + " ms"
+        loaded = subprocess.check_output([sys.executable, "-c", code]).split()
+        if loaded:
+            print "REGRESSION : import " + module + " loads " + ", ".join(loaded)
+    print
+
+
+BENCHMARKS = {
+    "encode": benchencode,
+    "cache": benchcache,
+    "ciphers": benchciphers,
+    "codec": benchcodec,
+    "cover": benchcover,
+    "gpg": benchgpg,
+    "reassemble": benchreassemble,
+    "render": benchrender,
+    "repack": benchrepack,
+    "screen": benchscreen,
+    "startup": benchstartup,
+    "steg": benchsteg,
+    "threads": benchthreads,
+    "wav": benchwav,
+    "wavfiles": benchwavfiles,
+    "workers": benchworkers,
+}
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description='Throughput benchmarks for JT65 steganography tools.',
+        epilog="Transmitting deceptive message over amateur radio in the US is a violation of FCC regulations")
+    parser.add_argument('benchmarks', nargs='*', metavar='<benchmark>',
+                        help='Benchmarks to run: ' + ', '.join(sorted(BENCHMARKS)) + ' (default: all)')
+    parser.add_argument('--count', type=int, default=10000, metavar='<count>',
+                        help='Number of packets per benchmark (default: 10000)')
+
+    args = parser.parse_args()
+
+    for name in args.benchmarks or sorted(BENCHMARKS):
+        if name not in BENCHMARKS:
+            parser.error("Unknown benchmark : " + name)
+        print "== " + name + " =="
+        BENCHMARKS[name](args.count)
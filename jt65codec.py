@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+#
+# Pure NumPy JT65 channel codec
+#
+# Copyright 2014 - Paul Drapeau and Brent Dukes
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# Drop in alternative to the Reed Solomon, interleave and graycode parts of the
+# JT65 f2py module (wrapkarn.c, interleave63.f90 and graycode.f90) written as
+# GF(64) table arithmetic over whole batches of packets. Results are bit for bit
+# the same as the JT65 module including the error counts and the data returned
+# for packets that can not be decoded.
+
+import numpy as np
+
+MM = 6  # bits per symbol
+NN = 63  # symbols per block
+A0 = NN  # log of zero
+GFPOLY = 0x43  # field generator polynomial
+CHUNK = 8192  # packets per pass through the decoder's error correction
+
+# GF(64) lookup tables, ALPHA_TO and INDEX_OF as in init_rs.c
+ALPHA_TO = np.zeros(NN + 1, dtype=np.int32)
+INDEX_OF = np.zeros(NN + 1, dtype=np.int32)
+INDEX_OF[0] = A0
+_sr = 1
+for _i in range(NN):
+    INDEX_OF[_sr] = _i
+    ALPHA_TO[_i] = _sr
+    _sr <<= 1
+    if _sr & (1 << MM):
+        _sr ^= GFPOLY
+    _sr &= NN
+
+# MUL[a, b] is the product of a and b and INV[a] the inverse of a, in poly form
+MUL = np.where(
+    (np.arange(NN + 1)[:, None] == 0) | (np.arange(NN + 1)[None, :] == 0), 0,
+    ALPHA_TO[(INDEX_OF[:, None] + INDEX_OF[None, :]) % NN]).astype(np.uint8)
+INV = np.where(np.arange(NN + 1) == 0, 0, ALPHA_TO[(NN - INDEX_OF) % NN]).astype(np.uint8)
+_MULFLAT = MUL.ravel()
+
+# graycode and its inverse for 6 bit symbols, see igray.c
+GRAY = np.array([n ^ (n >> 1) for n in range(NN + 1)], dtype=np.int32)
+GRAYINV = np.argsort(GRAY).astype(np.int32)
+
+
+def _gfmul(a, b):
+# returns the GF(64) product of two broadcastable arrays of symbols
+    return _MULFLAT.take((np.asarray(a, dtype=np.uint16) << MM) | b)
+
+
+def _lineartable(coeffs):
+# returns the table for _xortable of the linear map output[i] = sum over j of symbols[j] * coeffs[j, i]
+    table = np.zeros((coeffs.shape[0], NN + 1, _padto8(coeffs.shape[1])), dtype=np.uint8)
+    table[:, :, :coeffs.shape[1]] = MUL[np.arange(NN + 1)[None, :, None], coeffs[:, None, :]]
+    return table
+
+
+def _xortable(table, symbols):
+# returns the xor over all positions j of table[j, symbols[:, j]]
+# table rows are padded to a multiple of 8 bytes so they can be combined as uint64
+    words = table.view(np.uint64)
+    output = np.zeros((len(symbols), words.shape[2]), dtype=np.uint64)
+    for j in range(symbols.shape[1]):
+        output ^= words[j][symbols[:, j]]
+    return output.view(np.uint8)
+
+
+def _padto8(n):
+    return (n + 7) // 8 * 8
+
+
+class RSCodec(object):
+# Reed Solomon codec over GF(64) working in the symbol order of Karn's encode_rs_int
+# and decode_rs_int with no erasures, for the fcr, nroots and pad given to init_rs_int
+
+    def __init__(self, fcr, nroots, pad):
+        self.fcr = fcr
+        self.nroots = nroots
+        self.pad = pad
+        self.length = NN - pad  # symbols per codeword
+        self.kk = self.length - nroots  # data symbols per codeword
+
+        # Generator polynomial in index form, as in init_rs.c
+        genpoly = [1] + [0] * nroots
+        for i in range(nroots):
+            root = fcr + i
+            genpoly[i + 1] = 1
+            for j in range(i, 0, -1):
+                if genpoly[j] != 0:
+                    genpoly[j] = genpoly[j - 1] ^ ALPHA_TO[(INDEX_OF[genpoly[j]] + root) % NN]
+                else:
+                    genpoly[j] = genpoly[j - 1]
+            genpoly[0] = ALPHA_TO[(INDEX_OF[genpoly[0]] + root) % NN]
+        self.genpoly = [INDEX_OF[g] for g in genpoly]
+
+        # The code is linear so the parity and the syndromes are the xor of one table
+        # lookup per input symbol
+        self.paritytable = _lineartable(np.array([self._encodeone([0] * j + [1] + [0] * (self.kk - 1 - j))
+                                                  for j in range(self.kk)]))
+
+        powers = (self.length - 1 - np.arange(self.length))[:, None] * (fcr + np.arange(nroots))[None, :]
+        self.syndrometable = _lineartable(ALPHA_TO[powers % NN])
+
+        # Evaluating a polynomial at alpha ** root for every root 1..NN is linear in its
+        # coefficients too, used for the Chien search and Forney
+        powers = np.arange(nroots + 1)[:, None] * np.arange(1, NN + 1)[None, :]
+        self.roottable = _lineartable(ALPHA_TO[powers % NN])
+        self.dentable = np.ascontiguousarray(self.roottable[0:nroots:2])  # odd terms of lambda
+        self.num2 = ALPHA_TO[(np.arange(1, NN + 1) * (fcr - 1) + NN) % NN].astype(np.uint8)
+
+    def _encodeone(self, data):
+    # Karn's encode_rs_int for a single list of kk data symbols, returns the parity symbols
+        bb = [0] * self.nroots
+        for i in range(self.kk):
+            feedback = INDEX_OF[data[i] ^ bb[0]]
+            if feedback != A0:
+                for j in range(1, self.nroots):
+                    bb[j] ^= ALPHA_TO[(feedback + self.genpoly[self.nroots - j]) % NN]
+            bb = bb[1:] + [ALPHA_TO[(feedback + self.genpoly[0]) % NN] if feedback != A0 else 0]
+        return bb
+
+    def encode(self, data):
+    # returns an (N,nroots) array of parity symbols for the (N,kk) array of data symbols
+        return _xortable(self.paritytable, data)[:, :self.nroots]
+
+    def decode(self, recd):
+    # corrects the (N,length) array of received codewords in place
+    # returns an (N,) array of the number of corrected errors, -1 where uncorrectable
+        syndromes = _xortable(self.syndrometable, recd)[:, :self.nroots]
+        nerr = np.zeros(len(recd), dtype=np.int32)
+
+        witherrors = np.flatnonzero(syndromes.any(axis=1))
+        for start in range(0, len(witherrors), CHUNK):
+            index = witherrors[start:start + CHUNK]
+            nerr[index] = self._correct(recd, index, syndromes[index])
+
+        return nerr
+
+    def _correct(self, recd, index, syndromes):
+    # Berlekamp-Massey, Chien search and Forney for the packets in index which all have
+    # a non zero syndrome, following decode_rs_int step for step
+        count = len(index)
+        nroots = self.nroots
+
+        lam = np.zeros((count, nroots + 1), dtype=np.uint8)
+        lam[:, 0] = 1
+        b = lam.copy()
+        el = np.zeros(count, dtype=np.int32)
+        for r in range(1, nroots + 1):
+            discr = np.bitwise_xor.reduce(_gfmul(lam[:, :r], syndromes[:, r - 1::-1]), axis=1)
+            bshift = np.zeros_like(b)
+            bshift[:, 1:] = b[:, :-1]
+            update = (discr != 0) & (2 * el <= r - 1)
+            b = np.where(update[:, None], _gfmul(INV[discr][:, None], lam), bshift)
+            el = np.where(update, r - el, el)
+            lam = lam ^ _gfmul(discr[:, None], bshift)
+
+        deglambda = np.max(np.where(lam != 0, np.arange(nroots + 1), 0), axis=1)
+
+        # Roots of lambda, root i is error location i - 1
+        isroot = _xortable(self.roottable, lam)[:, :NN] == 0
+        nroot = isroot.sum(axis=1)
+        correctable = nroot == deglambda
+
+        # Error evaluator omega = syndromes * lambda mod x ** nroots, truncated to deg(lambda) - 1
+        omega = np.zeros((count, nroots), dtype=np.uint8)
+        for j in range(nroots):
+            omega[:, j:] ^= _gfmul(lam[:, j:j + 1], syndromes[:, :nroots - j])
+        omega[np.arange(nroots)[None, :] >= deglambda[:, None]] = 0
+
+        num1 = _xortable(self.roottable[:nroots], omega)[:, :NN]
+        den = _xortable(self.dentable, lam[:, 1::2])[:, :NN]
+        den[den == 0] = 1  # decode_rs_int divides by alpha ** A0 here
+        errors = _gfmul(_gfmul(num1, self.num2[None, :]), INV[den])
+
+        apply = isroot & correctable[:, None] & (num1 != 0)
+        apply[:, :self.pad] = False
+        errors[~apply] = 0
+        recd[index] ^= errors[:, self.pad:]
+
+        return np.where(correctable, nroot, -1)
+
+
+RS = RSCodec(3, 51, 0)  # JT65 RS(63,12), init_rs_int(6,0x43,3,1,51,0)
+RSSTEG = RSCodec(1, 8, 43)  # steg RS(20,12), init_rs_int(6,0x43,1,1,8,43)
+
+
+def _asbatch(symbols, length):
+# returns symbols, one packet or an array of packets, as an (N,length) int32 array
+    return np.asarray(symbols, dtype=np.int32).reshape(-1, length)
+
+
+def interleave63(symbols, idir):
+# interleave (idir >= 0) or deinterleave (idir < 0) an (N,63) array of symbols
+    if idir >= 0:
+        return symbols.reshape(-1, 9, 7).transpose(0, 2, 1).reshape(-1, 63)
+    return symbols.reshape(-1, 7, 9).transpose(0, 2, 1).reshape(-1, 63)
+
+
+def graycode(symbols, idir):
+# graycode (idir > 0) or remove graycode (idir <= 0) from an array of 6 bit symbols
+    if idir > 0:
+        return GRAY[symbols]
+    return GRAYINV[symbols]
+
+
+def rs_encode(dgen):
+# same as rs_encode in wrapkarn.c, returns (N,63) packets for the (N,12) data
+    parity = RS.encode(dgen[:, ::-1].astype(np.intp))
+    return np.hstack((parity[:, ::-1], dgen)).astype(np.int32)
+
+
+def rs_decode(recd0):
+# same as rs_decode in wrapkarn.c with no erasures
+# returns the (N,12) decoded data and the (N,) error counts for the (N,63) packets
+    recd = np.ascontiguousarray(recd0[:, ::-1], dtype=np.intp)
+    nerr = RS.decode(recd)
+    return recd[:, 11::-1].astype(np.int32), nerr
+
+
+def rs_stegencode(dgen):
+# same as rs_stegencode in wrapkarn.c, returns (N,20) steg packets for the (N,12) data
+    parity = RSSTEG.encode(dgen[:, ::-1].astype(np.intp))
+    return np.hstack((parity[:, ::-1], dgen)).astype(np.int32)
+
+
+def rs_stegdecode(recd0):
+# same as rs_stegdecode in wrapkarn.c with no erasures
+# returns the (N,12) decoded data and the (N,) error counts for the (N,20) steg packets
+    recd = np.ascontiguousarray(recd0[:, ::-1], dtype=np.intp)
+    nerr = RSSTEG.decode(recd)
+    return recd[:, 11::-1].astype(np.int32), nerr
+
+
+def prepmsg_batch(messages):
+# return an (N,63) array of channel symbols from an (N,12) array of JT65 message symbols
+# will do Reed Solomon coding, interleave and graycode
+    messages = _asbatch(messages, 12)
+    return graycode(interleave63(rs_encode(messages), 1), 1)
+
+
+def prepmsg(message):
+# return an array of 6 bit symbols preped for transmission on the channel as a JT65 packet
+    return prepmsg_batch(message)[0]
+
+
+def unprepmsg_batch(recvd):
+# return an (N,12) array of JT65 message symbols and an (N,) array of corrected error counts
+# from an (N,63) array of prepped or received JT65 packets, -1 means uncorrectable
+# recvd is preserved
+    recvd = _asbatch(recvd, 63)
+    return rs_decode(interleave63(graycode(recvd, -1), -1))
+
+
+def unprepmsg(recvd):
+# return an array of 6 bit symbols representing a JT65 message from the supplied recvd packet
+# unlike jt65wrapy.unprepmsg recvd is preserved
+    return unprepmsg_batch(recvd)[0][0]
+
+
+def prepsteg_batch(messages):
+# return an (N,20) array of steg packets from an (N,12) array of steg message symbols
+    messages = _asbatch(messages, 12)
+    return rs_stegencode(messages)
+
+
+def prepsteg(message):
+# return an array of 6 bit symbols preped for transmission as a 20 symbol steg packet
+    return prepsteg_batch(message)[0]
+
+
+def unprepsteg_batch(recvd):
+# return an (N,12) array of steg message symbols and an (N,) array of corrected error counts
+# from an (N,20) array of steg packets, -1 means uncorrectable
+# recvd is preserved
+    recvd = _asbatch(recvd, 20)
+    return rs_stegdecode(recvd)
+
+
+def unprepsteg(recvd):
+# return an array of 6 bit symbols representing a steg message from the supplied recvd packet
+# unlike jt65wrapy.unprepsteg recvd is preserved
+    return unprepsteg_batch(recvd)[0][0]
@@ -22,11 +22,14 @@
 
 import numpy as np
 import math
-import wave
 import sys
 import struct
 import jt65wrapy as jt
-import jt65soundlookup as jtl
+import multiprocessing
+import time
+
+TONE_TABLE_CACHE_SIZE = 16  # tone tables kept by tonetables, 512 to 580 KB each
+SYNC_ROW = 64  # row of the sync tone in the tone tables, rows 0 to 63 hold the tones of symbols 0 to 63
 
 
 def tone(number, m=1, offset=0):
@@ -71,101 +74,150 @@ def toneswithsync(message, m=1, offset=0):
     return output
 
 
-def outputwavfile(filename, tones, mode=1):
- # Creates .wav file with tones for broadcast
- # or for decoding in JT-65 tools
- #
- # Mode 0: Decodable by WSJT
- # Mode 1: Decodable by WSJT-X
+def symbolsamples(tones, data_size, frate, amp=1000.0):
+# returns an (N,data_size) int16 array with the samples of one symbol of each of the N tones in Hz
+# Every tone starts at phase 0 and its samples are int(sin(2 pi f x / frate) * amp / 2) as
+# they always were, np.sin may differ from math.sin in the last bit which can move a sample
+# that lands right on an integer by 1 LSB, otherwise the output is sample for sample the same
+    x = np.arange(data_size) / frate
+    sines = np.sin(2 * math.pi * np.asarray(tones, dtype=np.float)[:, np.newaxis] * x)
+    return (sines * amp / 2).astype(np.int16)
+
+
+def wavformat(mode=1):
+# returns the samples per jt65 symbol and the framerate as a float of wav file output mode
+#
+# Mode 0: Decodable by WSJT
+# Mode 1: Decodable by WSJT-X
 
     if mode == 0:
         # WSJT
-        data_size = 4096  # samples per jt65 symbol
-        frate = 11025.0  # framerate as a float
+        return 4096, 11025.0
 
     elif mode == 1:
         # WSJT-X
-        data_size = 4464  # samples per jt65 symbol
-        frate = 12000.0  # framerate as a float
-
-    else:
-        print("Unsupported wav file output mode : " + mode)
-        sys.exit(0)
-
-    wav_file = wave.open(filename, "w")
-
-    amp = 1000.0     # multiplier for amplitude
-    nchannels = 1
-    sampwidth = 2
-    framerate = int(frate)
-    nframes = frate * 60  # one full minute of audio
-    comptype = "NONE"
-    compname = "not compressed"
-
-    values = []
-    packed_zeros = struct.pack('h', int(0))
-
-    wav_file.setparams(
-        (nchannels, sampwidth, framerate, nframes, comptype, compname))
-
-    # Enjoy 1 second of silence (jt65 specs say start tx 1 sec after start of
-    # min)
-    for i in range(0, framerate):
-        values.append(packed_zeros)
-
-    # Generate the 126 tones for the wav file
-    for index in range(0, 126):
-        sine_list_x = []
-        for x in range(data_size):
-            sine_list_x.append(
-                math.sin(2 * math.pi * tones[index] * (x / frate)))
-        for s in sine_list_x:
-            packed_value = struct.pack('h', int(s * amp / 2))
-            values.append(packed_value)
-
-    # Finish out the minute with silence for the decoders to be happy with the
-    # .wav file
-    for i in range(0, (framerate * 59) - (126 * data_size)):
-        values.append(packed_zeros)
-
-    # Write to file
-    value_str = ''.join(values)
-    wav_file.writeframes(value_str)
-    wav_file.close()
+        return 4464, 12000.0
 
-    return filename
+    print("Unsupported wav file output mode : " + str(mode))
+    sys.exit(0)
+
+
+def buildtonetable(m=1, offset=0, mode=1):
+# returns the tone table of submode m (1, 2 or 4 as for tone) at frequency offset for wav
+# file output mode, an (65,data_size) int16 array with one symbol of audio of the tone of
+# every symbol value and the sync tone in row SYNC_ROW
+    data_size, frate = wavformat(mode)
+    tones = [tone(symbol, m, offset) for symbol in range(64)] + [1270.5 + offset]
+    return symbolsamples(tones, data_size, frate)
+
+
+class ToneTableCache(jt.LRUCache):
+# Size bounded least recently used cache of the tone tables from buildtonetable keyed by
+# (m, offset, mode), each table is built the first time it is asked for
+# The JT65A WSJT-X table with no offset is the one memory mapped by jt65soundlookup
+# The arrays returned are shared between callers so they are read only
+
+    def __init__(self, maxsize=TONE_TABLE_CACHE_SIZE):
+        jt.LRUCache.__init__(self, maxsize)
+
+    def get(self, m=1, offset=0, mode=1):
+    # returns the tone table of submode m at frequency offset for wav file output mode
+        key = (m, float(offset), mode)
+        table = self._lookup(key)
+        if table is not None:
+            return table
+
+        if key == (1, 0.0, 1):
+            import jt65soundlookup as jtl  # the table is memory mapped by the first call to gettable
+            table = jtl.gettable()
+        else:
+            table = buildtonetable(m, offset, mode)
+            table.flags.writeable = False
+
+        self._store(key, table)
+        return table
+
+
+tonetables = ToneTableCache()
 
 
-def outputwavfilequick(filename, tones):
+def wavheader(nframes, framerate):
+# returns the 44 byte header of a 16 bit mono PCM wav file of nframes frames, the same
+# header the wave module writes
+    datasize = nframes * 2
+    return struct.pack('<4sI4s4sIHHIIHH4sI', 'RIFF', 36 + datasize, 'WAVE', 'fmt ', 16, 1, 1,
+                       framerate, framerate * 2, 2, 16, 'data', datasize)
+
+
+def silenceblocks(count, blocksize):
+# generator yielding count samples of silence in blocks of at most blocksize samples
+    silence = np.zeros(blocksize, dtype=np.int16)
+    while count > 0:
+        yield silence[:count]
+        count -= blocksize
+
+
+def minuteblocks(symbols, data_size, framerate):
+# generator yielding a minute of audio in blocks of at most data_size samples, 1 second of
+# silence, the 126 symbols (int16 arrays of data_size samples) and silence to the end of the minute
+    for block in silenceblocks(framerate, data_size):
+        yield block
+    for samples in symbols:
+        yield samples
+    for block in silenceblocks((framerate * 59) - (126 * data_size), data_size):
+        yield block
+
+
+def streamwav(output, blocks, framerate):
+# Writes the wav header of a minute of audio at framerate followed by the int16 sample
+# blocks from minuteblocks as they are generated, only one block is held at a time
+# output is a file name or a file object such as sys.stdout or a pipe, it is written
+# from start to end without seeking
+    if isinstance(output, basestring):
+        with open(output, "wb") as wav_file:
+            streamwav(wav_file, blocks, framerate)
+        return
+
+    output.write(wavheader(framerate * 60, framerate))
+    for block in blocks:
+        if sys.byteorder == "big":
+            block = block.byteswap()  # wav samples are little endian
+        output.write(buffer(block))
+    output.flush()
+
+
+def outputwavfile(filename, tones, mode=1):
  # Creates .wav file with tones for broadcast
  # or for decoding in JT-65 tools
- # Uses a lookup table to generate the wav file very fast
+ # filename can also be a file object to stream the wav file to, see streamwav
  #
- # Only creates wav file quickly under the following conditions:
- #   WSJTX mode (no WSJT compatibility)
- #   JT65A
- #   Sync tone at 1270.5 Hz
+ # Mode 0: Decodable by WSJT
+ # Mode 1: Decodable by WSJT-X
 
-    data_size = 4464  # samples per jt65 symbol
-    frate = 12000.0  # framerate as a float
+    data_size, frate = wavformat(mode)
 
-    wav_file = wave.open(filename, "w")
+    # Each symbol is synthesized as it is written
+    symbols = (symbolsamples(tones[index:index + 1], data_size, frate)[0] for index in range(126))
+    streamwav(filename, minuteblocks(symbols, data_size, int(frate)), int(frate))
 
-    amp = 1000.0     # multiplier for amplitude
-    nchannels = 1
-    sampwidth = 2
-    framerate = int(frate)
-    nframes = frate * 60  # one full minute of audio
-    comptype = "NONE"
-    compname = "not compressed"
+    return filename
 
-    values = []
-    packed_zeros = struct.pack('h', int(0))
 
-    wav_file.setparams(
-        (nchannels, sampwidth, framerate, nframes, comptype, compname))
+def outputwavfilequick(filename, tones, m=1, offset=0, mode=1):
+ # Creates .wav file with tones for broadcast
+ # or for decoding in JT-65 tools
+ # Uses a lookup table to generate the wav file very fast
+ #
+ # tones is the jt65 packet (the symbols, not Hz), m, offset and mode are the submode,
+ # frequency offset and wav file output mode as for toneswithsync and outputwavfile
+ # The lookup table of each combination comes from tonetables, so only the first wav
+ # file of a combination has to wait for its table to be built
+ # filename can also be a file object to stream the wav file to, see streamwav
+
+    data_size, frate = wavformat(mode)
+    table = tonetables.get(m, offset, mode)
 
-    # Create a list of the 126 symbols for audio with 'S' representing the sync tone
+    # Create a list of the 126 table rows for audio, the sync tone has its own row
     output = [0] * 126
     messageindex = 0
     # the mystic 'pseudo-random sequence"
@@ -174,38 +226,48 @@ def outputwavfilequick(filename, tones):
         0, 1, 1, 0, 1, 0, 1, 0, 1, 0, 0, 1, 0, 0, 0, 0, 0, 0, 1, 1, 0, 0, 0, 0, 0, 0, 0, 1, 1, 0, 1, 0, 0, 1, 0, 1, 1, 0, 1, 0, 1, 0, 1, 0, 0, 1, 1, 0, 0, 1, 0, 0, 1, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 1, 1]
     for x in range(0, 126):
         if syncvector[x] == 1:
-            output[x] = 'S'
+            output[x] = SYNC_ROW
         else:
             output[x] = tones[messageindex]
             messageindex += 1
 
-    # Enjoy 1 second of silence (jt65 specs say start tx 1 sec after start of
-    # min)
-    for i in range(0, framerate):
-        values.append(packed_zeros)
-
-    # Generate the 126 tones for the wav file
-    for index in range(0, 126):
-        if output[index] == 'S':
-            for s in jtl.toneSync:
-                packed_value = struct.pack('h', s)
-                values.append(packed_value)
-        else:
-            for s in jtl.toneTable[output[index]]:
-                packed_value = struct.pack('h', s)
-                values.append(packed_value)
+    # The symbols are written straight out of the table rows
+    symbols = (table[row] for row in output)
+    streamwav(filename, minuteblocks(symbols, data_size, int(frate)), int(frate))
 
-    # Finish out the minute with silence for the decoders to be happy with the
-    # .wav file
-    for i in range(0, (framerate * 59) - (126 * data_size)):
-        values.append(packed_zeros)
+    return filename
 
-    # Write to file
-    value_str = ''.join(values)
-    wav_file.writeframes(value_str)
-    wav_file.close()
 
-    return filename
+def outputwavfiles(filenames, packets, m=1, offset=0, mode=1, workers=1):
+# Generator creating a wav file with outputwavfilequick for each of packets, filenames[i]
+# is the file of packets[i], yields (filename, seconds taken) for each file in order
+# With more than one worker the files are rendered by a multiprocessing pool of that many
+# processes, the tone table is built before the pool starts so the workers share it
+# File objects such as sys.stdout can not be handed to other processes, they are always
+# written here one after the other
+    jobs = [(filename, packet, m, offset, mode) for filename, packet in zip(filenames, packets)]
+    if workers <= 1 or not all(isinstance(filename, basestring) for filename in filenames):
+        for job in jobs:
+            yield renderwavfile(job)
+        return
+
+    tonetables.get(m, offset, mode)
+    pool = multiprocessing.Pool(workers)
+    try:
+        for result in pool.imap(renderwavfile, jobs):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def renderwavfile(job):
+# Runs outputwavfilequick for a (filename, packet, m, offset, mode) job from outputwavfiles
+# and returns (filename, seconds taken)
+    filename, packet, m, offset, mode = job
+    start = time.time()
+    outputwavfilequick(filename, packet, m, offset, mode)
+    return filename, time.time() - start
 
 
 def inputwavfile(filename, verbose=False):
@@ -221,9 +283,9 @@ def inputwavfile(filename, verbose=False):
             print "Symbols : " + str(symbols)
             print "Confidence : " + str(confidence)
             print "JT65 Msg : " + jt65msg
-            print "S2DB : " + s2db
-            print "Freq : " + freq
-            print "a1 : " + a1
-            print "a2 : " + a2
+            print "S2DB : " + str(s2db)
+            print "Freq : " + str(freq)
+            print "a1 : " + str(a1)
+            print "a2 : " + str(a2)
 
     return messages
@@ -22,17 +22,16 @@ import sys
 import jt65wrapy as jt
 import numpy as np
 import random
-from Crypto.Cipher import AES
-from Crypto.Cipher import ARC4
-from Crypto.Cipher import XOR
-from Crypto.Hash import SHA
-from gnupg import GPG
 import hashlib
 import binascii
 import struct
-import io
 import os
-import math
+import collections
+import itertools
+import multiprocessing
+
+# The Crypto cipher backends and gnupg are imported by the cipher classes that use them
+# so only the selected cipher is ever loaded
 
 
 # Maximum number of bytes a multi-packet steg message may contain
@@ -42,6 +41,16 @@ MAX_MULTI_PACKET_STEG_BYTES_AES = 128 * 8
 MAX_MULTI_PACKET_STEG_BYTES_GPG = 128 * 8
 MAX_MULTI_PACKET_STEG_BYTES_OTP = 64 * 8
 
+ENCODE_CHUNK_SIZE = 1000  # messages jt65encodemessages_stream hands to a worker at a time
+
+# statusbitswap as a permutation of the 72 bits of a status byte followed by 8 data bytes
+# (msb first), status bit i trades places with the first bit of even data bytes and the
+# second bit of odd ones. The swap is its own inverse so packing and unpacking share it
+STATUS_BIT_SWAP = np.arange(72)
+STATUS_BIT_SWAP[:8] = 8 + 8 * np.arange(8) + np.arange(8) % 2
+STATUS_BIT_SWAP[STATUS_BIT_SWAP[:8]] = np.arange(8)
+SIX_BIT_WEIGHTS = 1 << np.arange(5, -1, -1)  # value of each bit of a 6 bit symbol, msb first
+
 
 def jtsteg(prepedmsg, secretmsg, key):
 # simple stego routine to enbed a secret message into a preped jt65 packet according to key
@@ -50,8 +59,7 @@ def jtsteg(prepedmsg, secretmsg, key):
 # key - list defining stego positions to insert as error
 # returns a jt65 packet as a numpy array
     outputmsg = np.copy(prepedmsg)
-    for x in range(len(secretmsg)):
-        outputmsg[key[x]] = secretmsg[x]
+    outputmsg[tohidekey(key).positions[:len(secretmsg)]] = secretmsg
 
     return outputmsg
 
@@ -62,34 +70,114 @@ def jtunsteg(recdmsg, key):
 # key - list defining stego positions to interpret as message
 # returns a jt65 encoded string as a numpy array
     output = np.array(range(20), dtype=np.int32)  # array to return
-    for x in range(len(key)):
-        output[x] = recdmsg[key[x]]
+    key = tohidekey(key)
+    output[:len(key)] = np.asarray(recdmsg)[key.positions]
     return output
 
 
+def jtsteg_batch(prepedmsgs, secretmsgs, key):
+# jtsteg for many packets at once
+# prepedmsgs - (N,63) array of preped jt65 packets
+# secretmsgs - (N,20) array of encoded steg messages, row i is hidden in packet i
+# key - list defining stego positions to insert as error
+# returns a new (N,63) array of stegged jt65 packets
+    outputmsgs = np.array(prepedmsgs, ndmin=2)
+    secretmsgs = np.array(secretmsgs, ndmin=2)
+    outputmsgs[:, tohidekey(key).positions[:secretmsgs.shape[1]]] = secretmsgs
+    return outputmsgs
+
+
+def jtunsteg_batch(recdmsgs, key):
+# jtunsteg for many packets at once
+# recdmsgs - (N,63) array of jt65 packets
+# key - list defining stego positions to interpret as message
+# returns an (N,20) array of jt65 encoded steg messages
+    return np.array(recdmsgs, ndmin=2)[:, tohidekey(key).positions].astype(np.int32)
+
+
 def randomcover(message, key, howmuch=10, verbose=False):
 # insert some random cover noise
 # message is a stegged jt65 message stegged with key
 # howmuch is how much random "error" to add
-    noisecount = 0
-    locs = []
-    while noisecount < howmuch:
-        loc = random.randint(0, 62)
-        while loc in locs:
-            loc = random.randint(0, 62)
-        locs.extend([loc])
-        if verbose:
-            print "loc: " + str(loc)
-        coverint = random.randint(0, 63)
-        while coverint == message[loc]:
-            coverint = random.randint(0, 63)
-        message[loc] = coverint
-        if verbose:
-            print str(noisecount) + " round of cover - changed " + str(loc) + " to " + str(message[loc])
-        noisecount += 1
+    message[:] = randomcover_batch(message, howmuch, verbose=verbose)[0]
     return message
 
 
+def randomcover_batch(messages, howmuch=10, seed=None, exclude=None, verbose=False):
+# returns a copy of an (N,63) array of jt65 messages with howmuch random "errors" of cover
+# noise in each one, every error is at a different position and changes the symbol
+# seed is an int (or a RandomState to carry on with) so runs can be reproduced,
+# None draws fresh noise every time
+# exclude is a list of positions (such as a HideKey) that are left alone
+    messages = np.array(messages, ndmin=2)
+    if messages.size == 0:
+        return np.zeros((0, 63), dtype=np.int32)
+    rand = seed if isinstance(seed, np.random.RandomState) else np.random.RandomState(seed)
+
+    candidates = np.setdiff1d(np.arange(63), [] if exclude is None else tohidekey(exclude).positions)
+    if howmuch > len(candidates):
+        print "Amount of cover noise exceeds the " + str(len(candidates)) + " positions available for it"
+        sys.exit(0)
+
+    # The first howmuch of a random ordering of the candidates of every message, and a
+    # symbol that is 1 to 63 away from the old one so it is always different
+    order = np.argsort(rand.random_sample((len(messages), len(candidates))), axis=1)
+    locs = candidates[order[:, :howmuch]]
+    rows = np.arange(len(messages))[:, np.newaxis]
+    messages[rows, locs] = (messages[rows, locs] + rand.randint(1, 64, locs.shape)) % 64
+
+    if verbose and howmuch:
+        for index in range(len(messages)):
+            print "Message " + str(index) + " cover - changed " + str(locs[index].tolist()) + " to " + \
+                str(messages[index, locs[index]].tolist())
+
+    return messages
+
+
+class HideKey(list):
+# The steg positions of a noise key, used like the list of positions it is built from
+# while also keeping the index structures the steg functions need so they are not
+# rebuilt for every packet
+#   positions - read only int array of the key positions
+#   mask - read only 63 element boolean array, True at the key positions
+#   cover - read only int array of the positions that are not in the key
+# keys from getnoisekey are shared between callers, do not modify them
+
+    def __init__(self, positions, password=None):
+        list.__init__(self, positions)
+        self.password = password
+        self.positions = np.array(self, dtype=np.intp)
+        self.mask = np.zeros(63, dtype=bool)
+        self.mask[self.positions] = True
+        self.cover = np.flatnonzero(~self.mask)
+        for derived in (self.positions, self.mask, self.cover):
+            derived.flags.writeable = False
+        self.variants = {len(self): self}
+
+    def variant(self, length):
+    # returns this key with length positions (12 for no_fec, 20 for stego with fec)
+    # a shorter key is the start of a longer one so only longer keys hash the password again
+        if length not in self.variants:
+            if length <= len(self):
+                self.variants[length] = HideKey(self[:length], self.password)
+            elif self.password is not None:
+                self.variants[length] = getnoisekey(self.password, length)
+            else:
+                print "Can not lengthen a steg key that was not made from a password"
+                sys.exit(0)
+        return self.variants[length]
+
+
+def tohidekey(key):
+# returns key as a HideKey, key is a HideKey or a list of steg positions
+    if isinstance(key, HideKey):
+        return key
+    return HideKey(key)
+
+
+noisekeys = {}  # HideKeys from getnoisekey by (password, length)
+
+
 def getnoisekey(password, length=20):
 # I AM NOT A CRYPTOGRAPHER I HAVE NO IDEA IF THIS IS SAFE
 # THIS FEATURE LEAKS BITS OF THE sha512 HASH OF THE PASSWORD!!!
@@ -97,7 +185,11 @@ def getnoisekey(password, length=20):
 # hashes the password and then uses it to determine the key (insertion locations on the stego)
 # returns FALSE if no valid key can be obtained
 # set length based on the length of key you want (12 for no_fec, 20 for stego with fec)
+# the key is a HideKey, keys are remembered so each password is only hashed once per length
   # output = [np.array(range(length),dtype=np.int32)] #array to return
+    if (password, length) in noisekeys:
+        return noisekeys[(password, length)]
+
     output = []
     sha512calc = hashlib.sha512()
     sha512calc.update(password)
@@ -122,7 +214,8 @@ def getnoisekey(password, length=20):
         if keyindex == length:
             donthavekey = False
 
-    return output
+    noisekeys[(password, length)] = HideKey(output, password)
+    return noisekeys[(password, length)]
 
 
 def jt65tobytes(jt65bytes):
@@ -240,30 +333,109 @@ def statusbitswap(eightbytes, status):
     return returnbytes, returnstatus
 
 
-def jt65encodemessages(jt65msgs, verbose=False):
-# Encode valid text into array of JT65 data
-    jt65data = []
+def jt65tobytes_batch(jt65bytes):
+# jt65tobytes for an (N,12) array of JT65 messages, returns an (N,9) array of bytes
+    symbols = np.asarray(jt65bytes, dtype=np.int32).reshape(-1, 12) & 0x3F
+    bits = np.unpackbits(symbols.astype(np.uint8)[:, :, np.newaxis], axis=2)[:, :, 2:]
+    bits = bits.reshape(-1, 72)[:, STATUS_BIT_SWAP]
+    return np.packbits(bits, axis=1).astype(np.int32)
 
-    for index, value in enumerate(jt65msgs):
-        legitjt = jt.encode(value)
-        legitpacket = jt.prepmsg(legitjt)
 
-        if verbose:
-            print "JT65 legit message " + str(index) + " : " + value
-            print "Encoded as : " + str(legitjt)
-            print "Legit channel symbols with RS :" + str(legitpacket)
+def bytestojt65_batch(bytes):
+# bytestojt65 for an (N,9) array of bytes, returns an (N,12) array of JT65 messages
+# unlike bytestojt65 the bytes are left untouched
+    bytes = np.asarray(bytes).reshape(-1, 9).astype(np.uint8)
+    bits = np.unpackbits(bytes, axis=1)[:, STATUS_BIT_SWAP]
+    return np.dot(bits.reshape(-1, 12, 6), SIX_BIT_WEIGHTS).astype(np.int32)
 
-        jt65data.append(legitpacket)
 
-    return jt65data
+def bytes8tojt65_batch(bytes, status):
+# bytes8tojt65 for an (N,8) array of bytes and N status bytes (or one for every row)
+# returns an (N,12) array of JT65 messages
+    bytes = np.asarray(bytes).reshape(-1, 8)
+    fullbytes = np.empty((len(bytes), 9), dtype=np.int32)
+    fullbytes[:, 0] = status
+    fullbytes[:, 1:] = bytes
+    return bytestojt65_batch(fullbytes)
 
 
-def decodemessages(jt65data, verbose=False):
+def jt65encodemessages(jt65msgs, verbose=False, workers=1):
+# Encode valid text into array of JT65 data
+# with more than one worker the messages are encoded by a process pool, see jt65encodemessages_stream
+    if workers > 1:
+        return list(jt65encodemessages_stream(jt65msgs, verbose, workers))
+
+    legitjts, legitpackets = encodechunk(jt65msgs)[1:]
+
+    if verbose:
+        for index, value in enumerate(jt65msgs):
+            print "JT65 legit message " + str(index) + " : " + value
+            print "Encoded as : " + str(legitjts[index])
+            print "Legit channel symbols with RS :" + str(legitpackets[index])
+
+    return list(legitpackets)
+
+
+def jt65encodemessages_stream(jt65msgs, verbose=False, workers=1, chunksize=ENCODE_CHUNK_SIZE):
+# Generator yielding the JT65 data of each valid text message in jt65msgs in order
+# jt65msgs can be any iterable, even an endless one, it is read chunksize messages at a time
+# with more than one worker the chunks are encoded by a multiprocessing pool of that many
+# processes, only a few chunks per worker are read ahead of the data yielded so far
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.Pool(workers)
+
+    try:
+        index = 0
+        for chunkmsgs, legitjts, legitpackets in encodechunks(jt65msgs, chunksize, pool, 2 * workers):
+            for i in range(len(chunkmsgs)):
+                if verbose:
+                    print "JT65 legit message " + str(index) + " : " + chunkmsgs[i]
+                    print "Encoded as : " + str(legitjts[i])
+                    print "Legit channel symbols with RS :" + str(legitpackets[i])
+                yield legitpackets[i]
+                index += 1
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+
+def encodechunks(jt65msgs, chunksize, pool=None, readahead=1):
+# Generator yielding encodechunk of each chunk of chunksize messages from jt65msgs in order
+# with a pool up to readahead chunks are being encoded by the pool at a time
+    iterator = iter(jt65msgs)
+    chunks = iter(lambda: list(itertools.islice(iterator, chunksize)), [])
+
+    if pool is None:
+        for chunk in chunks:
+            yield encodechunk(chunk)
+        return
+
+    pending = collections.deque()
+    for chunk in chunks:
+        pending.append(pool.apply_async(encodechunk, (chunk,)))
+        if len(pending) >= readahead:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def encodechunk(jt65msgs):
+# Encodes a list of valid text messages, returns the messages with their JT65 message
+# symbols and channel symbols, run in the worker processes of jt65encodemessages_stream
+    legitjts = jt.encode_batch(jt65msgs)
+    return jt65msgs, legitjts, jt.prepmsg_batch(legitjts)
+
+
+def decodemessages(jt65data, verbose=False, confidence=None):
 # Decode valid JT65 messages from array of JT65 data
+# confidence is the optional per symbol confidence from the decoder, see jt65wrapy.unprepmsg
     jt65msgs = []
+    decoded, nerrs = jt.unprepmsg_batch(jt65data, confidence)
 
-    for index, value in enumerate(jt65data):
-        jt65msg = jt.decode(jt.unprepmsg(value))
+    for index, value in enumerate(decoded):
+        jt65msg = jt.decode(value)
         if verbose:
             print "JT65 Message " + str(index) + " : " + jt65msg
         jt65msgs.append(jt65msg)
@@ -342,53 +514,12 @@ def otp_decode(stegmsg, key):
 
 def createciphermsgs(jt65msgcount, stegmsg, cipher, key, recipient, aesmode, verbose=False):
 # Creates the JT65 symbols used for steganography, including the requested
-# cipher
-    ciphermsgs = []
-
-    if cipher == "none":
-        return createciphermsgs_none(jt65msgcount, stegmsg, verbose)
-
-    if cipher == "XOR":
-        return createciphermsgs_xor(jt65msgcount, stegmsg, key, verbose)
-
-    if cipher == "ARC4":
-        return createciphermsgs_arc4(jt65msgcount, stegmsg, key, verbose)
-
-    if cipher == "AES":
-        return createciphermsgs_aes(jt65msgcount, stegmsg, key, aesmode, verbose)
+# cipher, the cipher objects come from getcipher
+    cipherobj = getcipher(cipher, key, aesmode, recipient)
+    if cipherobj is None:
+        return None
 
-    if cipher == "GPG":
-        return createciphermsgs_gpg(jt65msgcount, stegmsg, recipient, verbose)
-
-    if cipher == "OTP":
-        return createciphermsgs_otp(jt65msgcount, stegmsg, key, verbose)
-
-    return None
-
-
-def createciphermsgs_none(jt65msgcount, stegmsg, verbose=False):
-# Packs hidden message into JT65 symbols with no cipher
-
-    ciphermsgs = []
-
-    # Can we fit your hidden message?
-    if jt65msgcount * 13 < len(stegmsg):
-        print(
-            "Length of hidden message exceeds capacity of number of valid JT65 messages provided")
-        sys.exit(0)
-
-    for index in range(jt65msgcount):
-        secretjt = jt.encode(stegmsg[index * 13:index * 13 + 13])
-        secretjtfec = jt.prepsteg(secretjt)
-
-        if verbose:
-            print "Secret message " + str(index) + " : " + stegmsg[index * 13:index * 13 + 13]
-            print "Secret message " + str(index) + " encoded : " + str(secretjt)
-            print "Secret message " + str(index) + " encoded with FEC : " + str(secretjtfec)
-
-        ciphermsgs.append(secretjtfec)
-
-    return ciphermsgs
+    return cipherobj.createciphermsgs(jt65msgcount, stegmsg, verbose)
 
 
 def createciphermsgs_packer_xor(totalpackets, originallength, ciphermsgs, cipherlist, verbose=False):
@@ -453,365 +584,606 @@ def createciphermsgs_packer_other(totalpackets, ciphermsgs, cipherlist, verbose=
         ciphermsgs.append(secretjtfec)
 
 
-def createciphermsgs_xor(jt65msgcount, stegmsg, key, verbose=False):
-# Performs the actual XOR cipher
+class PassthroughStream(object):
+# Stands in for a Crypto cipher object when the data is sent as it is
 
-    ciphermsgs = []
+    def encrypt(self, data):
+        return data
 
-    # Can we fit your hidden message?
-    if jt65msgcount * 8 < len(stegmsg):
-        print(
-            "Length of hidden message exceeds capacity of number of valid JT65 messages provided")
-        sys.exit(0)
+    def decrypt(self, data):
+        return data
 
-    originallength = len(stegmsg)
-    while len(stegmsg) % 8:
-        stegmsg += chr(random.randint(0, 255))
 
-    cryptobj = XOR.new(key)
-    cipherdata = cryptobj.encrypt(stegmsg)
-    cipherlist = list(bytearray(cipherdata))
+class OTPStream(object):
+# Crypto style cipher object for the one time pad, keeps track of how far into
+# the key the data processed so far has got
 
-    # Is the total length too big to fit into our max number of packets?
-    if len(cipherlist) > MAX_MULTI_PACKET_STEG_BYTES_XOR:
-        print("Length of hidden message exceeds capacity of multi-packet steg")
-        sys.exit(0)
-    totalpackets = len(cipherlist) / 8
+    def __init__(self, key):
+        self.key = key
+        self.position = 0
 
-    if verbose:
-        print "Cipher list: " + str(cipherlist)
+    def nextkey(self, length):
+        key = self.key[self.position:self.position + length]
+        self.position += length
+        return key
 
-    createciphermsgs_packer_xor(
-        totalpackets, originallength, ciphermsgs, cipherlist, verbose)
+    def encrypt(self, data):
+        return otp_encode(data, self.nextkey(len(data)))
 
-    return ciphermsgs
+    def decrypt(self, data):
+        return otp_decode(data, self.nextkey(len(data)))
 
 
-def createciphermsgs_arc4(jt65msgcount, stegmsg, key, verbose=False):
-# Performs the actual ARC4 cipher
+class StegCipher(object):
+# Base of the ciphers in CIPHERS, getcipher makes one object per key and it is reused for
+# every message and packet after that so key material is only worked out once
+# A cipher sets name and maxbytes (its MAX_MULTI_PACKET_STEG_BYTES) and provides
+# newcryptobj(iv) returning a fresh Crypto style object with encrypt and decrypt,
+# createciphermsgs and deciphersteg then work for it as they are
+#   blocksize - hidden messages are padded to a multiple of blocksize bytes
+#   ivsize - bytes of random IV sent ahead of the cipher data
+#   streamblock - steg streams are encrypted streamblock bytes at a time
+#   streamable - False if the cipher can not be used for steg streams
+#   lastpacketlength - the last packet says how many of its bytes to read, see
+#                      createciphermsgs_packer_xor
+    name = None
+    maxbytes = 0
+    blocksize = 8
+    ivsize = 0
+    streamblock = 1
+    streamable = True
+    lastpacketlength = False
 
-    ciphermsgs = []
+    def __init__(self, key, aesmode, recipient):
+        self.key = key
+        self.aesmode = aesmode
+        self.recipient = recipient
 
-    # Can we fit your hidden message?
-    if jt65msgcount * 8 < len(stegmsg):
-        print(
-            "Length of hidden message exceeds capacity of number of valid JT65 messages provided")
-        sys.exit(0)
+    def newcryptobj(self, iv=""):
+        return PassthroughStream()
 
-    while len(stegmsg) % 8:
-        stegmsg += " "
+    def newiv(self):
+        return ''.join(chr(random.randint(0, 0xFF)) for i in range(self.ivsize))
 
-    tempkey = SHA.new(key).digest()
-    cryptobj = ARC4.new(tempkey)
-    cipherdata = cryptobj.encrypt(stegmsg)
-    cipherlist = list(bytearray(cipherdata))
+    def pad(self, stegmsg):
+        while len(stegmsg) % self.blocksize:
+            stegmsg += " "
+        return stegmsg
 
-    # Is the total length too big to fit into our max number of packets?
-    if len(cipherlist) > MAX_MULTI_PACKET_STEG_BYTES_ARC4:
-        print("Length of hidden message exceeds capacity of multi-packet steg")
-        sys.exit(0)
-    totalpackets = len(cipherlist) / 8
+    def encrypt(self, stegmsg):
+    # returns the cipher data sent for stegmsg
+        iv = self.newiv()
+        return iv + self.newcryptobj(iv).encrypt(self.pad(stegmsg))
 
-    if verbose:
-        print "Cipher list: " + str(cipherlist)
+    def decrypt(self, cipherdata):
+    # returns the hidden message from the reassembled cipher data
+        cryptobj = self.newcryptobj(cipherdata[0:self.ivsize])
+        return cryptobj.decrypt(buffer(cipherdata, self.ivsize))
 
-    createciphermsgs_packer_other(
-        totalpackets, ciphermsgs, cipherlist, verbose)
+    def createciphermsgs(self, jt65msgcount, stegmsg, verbose=False):
+    # Creates the JT65 symbols used for steganography from stegmsg
+        originallength = len(stegmsg)
+        cipherlist = list(bytearray(self.encrypt(stegmsg)))
 
-    return ciphermsgs
+        if verbose:
+            print "Cipher list: " + str(cipherlist)
+
+        # Can we fit your hidden message?
+        if jt65msgcount * 8 < len(cipherlist):
+            print(
+                "Length of hidden message exceeds capacity of number of valid JT65 messages provided")
+            sys.exit(0)
+
+        # Is the total length too big to fit into our max number of packets?
+        if len(cipherlist) > self.maxbytes:
+            print("Length of hidden message exceeds capacity of multi-packet steg")
+            sys.exit(0)
+        totalpackets = len(cipherlist) / 8
+
+        ciphermsgs = []
+        if self.lastpacketlength:
+            createciphermsgs_packer_xor(
+                totalpackets, originallength, ciphermsgs, cipherlist, verbose)
+        else:
+            createciphermsgs_packer_other(
+                totalpackets, ciphermsgs, cipherlist, verbose)
 
+        return ciphermsgs
 
-def createciphermsgs_aes(jt65msgcount, stegmsg, key, aesmode, verbose=False):
-# Performs the actual AES encryption
+    def deciphersteg(self, stegdata, verbose=False):
+    # Decipher hidden message from array of unprepped steg data
+        return self.decrypt(reassemblesteg(stegdata, self.name, verbose))
 
-    ciphermsgs = []
 
-    # Check key size
-    if len(key) != 16 and len(key) != 24 and len(key) != 32:
-        print ("\nCipher key must be 16, 24, or 32 bytes... sorry :(\n")
-        sys.exit(0)
+class NoneCipher(StegCipher):
+# Hidden message sent as text with no cipher, 13 characters in each packet
+    name = "none"
 
-    while len(stegmsg) % 16:
-        stegmsg += " "
+    def createciphermsgs(self, jt65msgcount, stegmsg, verbose=False):
+        ciphermsgs = []
 
-    # Can we fit your hidden message?
-    if aesmode == "ECB" and jt65msgcount * 8 < len(stegmsg):
-        print(
-            "Length of hidden message exceeds capacity of number of valid JT65 messages provided")
-        sys.exit(0)
-    elif (aesmode == "CBC" or aesmode == "CFB") and (jt65msgcount * 8 < len(stegmsg) + 16):
-        # These two modes have an additional 16 byte IV
-        print(
-            "Length of hidden message exceeds capacity of number of valid JT65 messages provided")
-        sys.exit(0)
+        # Can we fit your hidden message?
+        if jt65msgcount * 13 < len(stegmsg):
+            print(
+                "Length of hidden message exceeds capacity of number of valid JT65 messages provided")
+            sys.exit(0)
 
-    # Prep the encrypted hidden data
-    iv = ""
-    if aesmode == "ECB":
-        cryptobj = AES.new(key, AES.MODE_ECB)
-    elif aesmode == "CBC":
-        iv = ''.join(chr(random.randint(0, 0xFF)) for i in range(16))
-        cryptobj = AES.new(key, AES.MODE_CBC, iv)
-    elif aesmode == "CFB":
-        iv = ''.join(chr(random.randint(0, 0xFF)) for i in range(16))
-        cryptobj = AES.new(key, AES.MODE_CFB, iv)
-
-    cipherdata = cryptobj.encrypt(stegmsg)
-    cipherlist = list(bytearray(iv)) + list(bytearray(cipherdata))
-
-    # Is the total length too big to fit into our max number of packets?
-    if len(cipherlist) > MAX_MULTI_PACKET_STEG_BYTES_AES:
-        print("Length of hidden message exceeds capacity of multi-packet steg")
-        sys.exit(0)
-    totalpackets = len(cipherlist) / 8
+        for index in range(jt65msgcount):
+            secretjt = jt.encode(stegmsg[index * 13:index * 13 + 13])
+            secretjtfec = jt.prepsteg(secretjt)
 
-    if verbose:
-        print "Cipher list: " + str(cipherlist)
+            if verbose:
+                print "Secret message " + str(index) + " : " + stegmsg[index * 13:index * 13 + 13]
+                print "Secret message " + str(index) + " encoded : " + str(secretjt)
+                print "Secret message " + str(index) + " encoded with FEC : " + str(secretjtfec)
 
-    createciphermsgs_packer_other(
-        totalpackets, ciphermsgs, cipherlist, verbose)
+            ciphermsgs.append(secretjtfec)
 
-    return ciphermsgs
+        return ciphermsgs
 
+    def deciphersteg(self, stegdata, verbose=False):
+        recoveredtext = []
+        for index, value in enumerate(stegdata):
+            recoveredtext.append(jt.decode(value)[0:13])
+            if verbose:
+                print "Steg Text in Message " + str(index) + " : " + recoveredtext[-1]
+        return ''.join(recoveredtext)
 
-def createciphermsgs_gpg(jt65msgcount, stegmsg, recipient, verbose=False):
-# Performs the actual GPG encryption
 
-    ciphermsgs = []
+class XORCipher(StegCipher):
+    name = "XOR"
+    maxbytes = MAX_MULTI_PACKET_STEG_BYTES_XOR
+    lastpacketlength = True
 
-    while len(stegmsg) % 8:
-        stegmsg += " "
+    def __init__(self, key, aesmode, recipient):
+        StegCipher.__init__(self, key, aesmode, recipient)
+        from Crypto.Cipher import XOR
+        self.xor = XOR
 
-    gpg = GPG()
-    stegstream = io.StringIO(unicode(stegmsg))
-    cipherdata = gpg.encrypt_file(stegstream, recipient)
+    def newcryptobj(self, iv=""):
+        return self.xor.new(self.key)
 
-    if cipherdata == "":
-        print "You must set the recipient's trust level to -something- in your keyring before we can encrypt the message"
-        sys.exit(0)
+    def pad(self, stegmsg):
+        while len(stegmsg) % self.blocksize:
+            stegmsg += chr(random.randint(0, 255))
+        return stegmsg
 
-    cipherlist = list(bytearray(str(cipherdata)))
 
-    if verbose:
-        print "Cipher list: " + str(cipherlist)
+class ARC4Cipher(StegCipher):
+    name = "ARC4"
+    maxbytes = MAX_MULTI_PACKET_STEG_BYTES_ARC4
 
-    if jt65msgcount * 8 < len(cipherlist):
-        print(
-            "Length of hidden message exceeds capacity of number of valid JT65 messages provided")
-        sys.exit(0)
+    def __init__(self, key, aesmode, recipient):
+        StegCipher.__init__(self, key, aesmode, recipient)
+        from Crypto.Cipher import ARC4
+        from Crypto.Hash import SHA
+        self.arc4 = ARC4
+        self.arc4key = SHA.new(key).digest()
 
-    # Is the total length too big to fit into our max number of packets?
-    if len(cipherlist) > MAX_MULTI_PACKET_STEG_BYTES_GPG:
-        print("Length of hidden message exceeds capacity of multi-packet steg")
-        sys.exit(0)
-    totalpackets = len(cipherlist) / 8
+    def newcryptobj(self, iv=""):
+        return self.arc4.new(self.arc4key)
 
-    createciphermsgs_packer_other(
-        totalpackets, ciphermsgs, cipherlist, verbose)
 
-    return ciphermsgs
+class AESCipher(StegCipher):
+# ECB needs no IV so one AES object does every message, CBC and CFB send a 16 byte IV
+# ahead of the cipher data
+    name = "AES"
+    maxbytes = MAX_MULTI_PACKET_STEG_BYTES_AES
+    blocksize = 16
 
+    def __init__(self, key, aesmode, recipient):
+        StegCipher.__init__(self, key, aesmode, recipient)
 
-def createciphermsgs_otp(jt65msgcount, stegmsg, key, verbose=False):
-# Performs the actual one time pad cipher
+        # Check key size
+        if len(key) != 16 and len(key) != 24 and len(key) != 32:
+            print ("\nCipher key must be 16, 24, or 32 bytes... sorry :(\n")
+            sys.exit(0)
 
-    ciphermsgs = []
+        from Crypto.Cipher import AES
+        self.aes = AES
+        if aesmode == "ECB":
+            self.ecb = AES.new(key, AES.MODE_ECB)
+        else:
+            self.ivsize = 16
+        if aesmode != "CFB":
+            self.streamblock = 16
 
-    # Can we fit your hidden message?
-    if jt65msgcount * 8 < len(stegmsg):
-        print(
-            "Length of hidden message exceeds capacity of number of valid JT65 messages provided")
-        sys.exit(0)
+    def newcryptobj(self, iv=""):
+        if self.aesmode == "ECB":
+            return self.ecb
+        if self.aesmode == "CBC":
+            return self.aes.new(self.key, self.aes.MODE_CBC, iv)
+        return self.aes.new(self.key, self.aes.MODE_CFB, iv)
 
-    originallength = len(stegmsg)
 
-    stegmsg = otp_encode(stegmsg, key)
-    while len(stegmsg) % 8:
-        stegmsg += " "
+class GPGSession(object):
+# One configured GPG handle on one keyring, kept for as long as the session is used so
+# gpg is set up once rather than for every message
+# gnupghome is the keyring directory, None for the default keyring of the user
+# Payloads and results are piped to and from gpg, plaintext is never written to disk
 
-    cipherlist = list(bytearray(str(stegmsg)))
+    def __init__(self, gnupghome=None):
+        from gnupg import GPG
+        self.gnupghome = gnupghome
+        self.gpg = GPG(gnupghome=gnupghome)
 
-    if verbose:
-        print "Cipher list: " + str(cipherlist)
+    def encrypt(self, payload, recipient):
+    # returns payload encrypted for recipient as ASCII armor, "" if it could not be encrypted
+        return str(self.gpg.encrypt(payload, recipient))
 
-    # Is the total length too big to fit into our max number of packets?
-    if len(cipherlist) > MAX_MULTI_PACKET_STEG_BYTES_OTP:
-        print("Length of hidden message exceeds capacity of multi-packet steg")
-        sys.exit(0)
-    totalpackets = int(math.ceil(float(len(cipherlist)) / 8))
+    def decrypt(self, cipherdata):
+    # returns the decrypted cipherdata, "" if it could not be decrypted
+        return str(self.gpg.decrypt(cipherdata))
 
-    createciphermsgs_packer_xor(
-        totalpackets, originallength, ciphermsgs, cipherlist, verbose)
 
-    return ciphermsgs
+gnupghome = None  # keyring directory used by the GPG cipher, None for the default keyring
+gpgsessions = {}  # GPGSessions from getgpgsession by keyring directory
 
 
-def steginject(jt65data, noise, cipherdata, hidekey, verbose=False):
-# Combine array of JT65 valid messages with array of JT65 encoded steg data
-    finalpackets = []
+def getgpgsession(home=None):
+# returns the GPGSession on the keyring in directory home, made the first time it is
+# asked for and reused after that
+    if home not in gpgsessions:
+        gpgsessions[home] = GPGSession(home)
+    return gpgsessions[home]
 
-    for index in range(len(jt65data)):
 
-        if index < len(cipherdata):
-            stegedpacket = jtsteg(jt65data[index], cipherdata[index], hidekey)
+class GPGCipher(StegCipher):
+# Uses the GPGSession of the gnupghome keyring
+    name = "GPG"
+    maxbytes = MAX_MULTI_PACKET_STEG_BYTES_GPG
+    streamable = False
 
-        else:
-            # There were more JT65 msgs than needed to carry the cipherdata,
-            # just use the leftover JT65 msgs as is
-            stegedpacket = jt65data[index]
+    def __init__(self, key, aesmode, recipient):
+        StegCipher.__init__(self, key, aesmode, recipient)
+        self.session = getgpgsession(gnupghome)
 
-        stegedpacket = randomcover(stegedpacket, hidekey, noise, verbose)
-        finalpackets.append(stegedpacket)
+    def encrypt(self, stegmsg):
+        cipherdata = self.session.encrypt(self.pad(stegmsg), self.recipient)
 
-    return finalpackets
+        if cipherdata == "":
+            print "You must set the recipient's trust level to -something- in your keyring before we can encrypt the message"
+            sys.exit(0)
 
+        return cipherdata
 
-def validatesteg(jt65msg, rxsymbols, hidekey, errordetectionthreshold, verbose=False):
-# Determines if a given set of symbols contain steganography or are a
-# normal JT65 message
+    def decrypt(self, cipherdata):
+        return self.session.decrypt(str(cipherdata))
 
-    errorcount = 0
 
-    # Determine what the symbols would be if there were no errors
-    truesymbols = jt.prepmsg(jt.encode(jt65msg))
+class OTPCipher(StegCipher):
+    name = "OTP"
+    maxbytes = MAX_MULTI_PACKET_STEG_BYTES_OTP
+    lastpacketlength = True
 
-    # Determine how many symbols where steg should be hidden contain errors
-    for i in hidekey:
-        if rxsymbols[i] != truesymbols[i]:
-            errorcount += 1
+    def newcryptobj(self, iv=""):
+        return OTPStream(self.key)
 
-    if errorcount >= errordetectionthreshold:
-        return True
+    def encrypt(self, stegmsg):
+        # The padding is added after the one time pad so the key only has to cover stegmsg
+        return self.pad(self.newcryptobj().encrypt(stegmsg))
 
-    return False
 
+# The ciphers by the name used for them on the command line, a new cipher only has to
+# be added here
+CIPHERS = {
+    "none": NoneCipher,
+    "XOR": XORCipher,
+    "ARC4": ARC4Cipher,
+    "AES": AESCipher,
+    "GPG": GPGCipher,
+    "OTP": OTPCipher,
+}
 
-def retrievesteg(jt65data, hidekey, verbose=False, unprep=False):
-# Retrieve steganography data from array of JT65 data
-    stegdata = []
+cipherobjs = {}  # cipher objects from getcipher by (cipher, key, aesmode, recipient)
 
-    for index, value in enumerate(jt65data):
-        data = jtunsteg(value, hidekey)
 
-        if verbose:
-            print "Steg Bytes in Message " + str(index) + " : " + str(data)
+def getcipher(cipher, key, aesmode="ECB", recipient=None):
+# returns the cipher object of the named cipher for key, made the first time it is asked
+# for and reused after that, returns None if cipher is not in CIPHERS
+    if cipher not in CIPHERS:
+        return None
 
-        if unprep:
-            data = jt.unprepsteg(data)
+    if (cipher, key, aesmode, recipient) not in cipherobjs:
+        cipherobjs[(cipher, key, aesmode, recipient)] = CIPHERS[cipher](key, aesmode, recipient)
+    return cipherobjs[(cipher, key, aesmode, recipient)]
 
-        stegdata.append(data)
 
-    return stegdata
+def steginject(jt65data, noise, cipherdata, hidekey, verbose=False, seed=None):
+# Combine array of JT65 valid messages with array of JT65 encoded steg data
+# seed is passed on to randomcover_batch for the cover noise
+    if len(jt65data) == 0:
+        return []
 
+    finalpackets = np.array(jt65data, ndmin=2)
 
-def deciphersteg(stegdata, cipher, key, aesmode, verbose=False, unprep=True):
-# Decipher hidden message from array of data hidden in JT65 errors
-    stegedmsg = ""
-    stegedmsgba = np.array(range(0), dtype=np.int32)
-    statusar = []
+    # There may be more JT65 msgs than needed to carry the cipherdata,
+    # the leftover JT65 msgs are used as is
+    stegcount = min(len(cipherdata), len(finalpackets))
+    if stegcount:
+        finalpackets[:stegcount] = jtsteg_batch(finalpackets[:stegcount], cipherdata[:stegcount], hidekey)
 
-    for index, value in enumerate(stegdata):
-        if unprep:
-            value = jt.unprepsteg(value)  # Decode real data from FEC
+    return list(randomcover_batch(finalpackets, noise, seed, verbose=verbose))
 
-        if cipher == "none":
-            recoveredtext = jt.decode(value)[0:13]
-            if verbose:
-                print "Steg Text in Message " + str(index) + " : " + recoveredtext
-            stegedmsg += recoveredtext
 
-        elif cipher == "XOR" or cipher == "OTP":
-            thesebytes = jt65tobytes(value)
+def validatesteg(jt65msg, rxsymbols, hidekey, errordetectionthreshold, verbose=False):
+# Determines if a given set of symbols contain steganography or are a
+# normal JT65 message
+# rxsymbols can also be a decode record from jt65wrapy.decodewav
 
-            thisstatus = thesebytes[0:1]
+    rxsymbols = np.asarray(jt.packetsymbols(rxsymbols))
+    positions = tohidekey(hidekey).positions
 
-            if thisstatus & 0x40 == 0x40:
-                # This is the last packet, signals how many bytes to read
-                bytestoread = thisstatus & 0x3F
-                thisunstegbytes = thesebytes[1:bytestoread + 1]
-            else:
-                thisunstegbytes = thesebytes[1:]
+    # Determine what the symbols would be if there were no errors
+    truesymbols = jt.symbolcache.frommessage(jt65msg)
 
-            if verbose:
-                print "Steg Data in Message " + str(index) + " : " + str(thisunstegbytes)
-            stegedmsgba = np.append(stegedmsgba, thisunstegbytes)
+    # Determine how many symbols where steg should be hidden contain errors
+    errorcount = np.count_nonzero(rxsymbols[positions] != truesymbols[positions])
 
-        else:
-            thesebytes = jt65tobytes(value)
-            thisunstegbytes = thesebytes[1:10]
+    if errorcount >= errordetectionthreshold:
+        return True
 
-            if verbose:
-                print "Steg Data in Message " + str(index) + " : " + str(thisunstegbytes)
-            stegedmsgba = np.append(stegedmsgba, thisunstegbytes)
+    return False
 
-    if cipher == "XOR":
-        if verbose:
-            print"Cipher Data : " + str(stegedmsgba)
 
-        finalcipherdata = (
-            ''.join('{0:02x}'.format(int(e)).decode("hex") for e in stegedmsgba))
+def screensteg(jt65data, hidekey, confidence=None):
+# Screens a batch of received JT65 packets for steganography without decoding them to text
+# The RS decode of each packet gives the codeword that was sent, comparing it with the
+# received symbols gives the error pattern directly
+# jt65data is an (N,63) array of packets or a list of packets or decode records
+# confidence is the optional (N,63) symbol confidence used for erasures, see jt65wrapy.unprepmsg
+# returns a tuple (errors, keyerrors, nerr)
+#   errors - (N,63) boolean array, True where a symbol was received in error
+#   keyerrors - (N,) number of errors on the steg positions of hidekey
+#   nerr - (N,) errors corrected by the RS decode, -1 if the packet could not be decoded
+#          in which case it has no errors flagged as the sent codeword is unknown
+    packets = np.array([jt.packetsymbols(value) for value in jt65data], dtype=np.int32).reshape(-1, 63)
 
-        if verbose:
-            print"Cipher Data Hex : " + finalcipherdata
+    decoded, nerr = jt.unprepmsg_batch(packets, confidence)
+    errors = jt.prepmsg_batch(decoded) != packets
+    errors[nerr < 0] = False
+    keyerrors = np.count_nonzero(errors[:, tohidekey(hidekey).positions], axis=1)
 
-        cryptobj = XOR.new(key)
-        stegedmsg = cryptobj.decrypt(finalcipherdata)
+    return errors, keyerrors, nerr
 
-    if cipher == "ARC4":
-        if verbose:
-            print"Cipher Data : " + str(stegedmsgba)
 
-        finalcipherdata = (
-            ''.join('{0:02x}'.format(int(e)).decode("hex") for e in stegedmsgba))
+def retrievesteg(jt65data, hidekey, verbose=False, unprep=False):
+# Retrieve steganography data from array of JT65 data
+# jt65data can also hold decode records from jt65wrapy.decodewav
+    if len(jt65data) == 0:
+        return []
 
-        if verbose:
-            print"Cipher Data Hex : " + finalcipherdata
+    stegdata = jtunsteg_batch([jt.packetsymbols(value) for value in jt65data], hidekey)
 
-        tempkey = SHA.new(key).digest()
-        cryptobj = ARC4.new(tempkey)
-        stegedmsg = cryptobj.decrypt(finalcipherdata)
+    if verbose:
+        for index, data in enumerate(stegdata):
+            print "Steg Bytes in Message " + str(index) + " : " + str(data)
 
-    if cipher == "AES":
-        if verbose:
-            print"Cipher Data : " + str(stegedmsgba)
+    if unprep:
+        stegdata = jt.unprepsteg_batch(stegdata)[0]
+
+    return list(stegdata)
+
+
+def reassemblesteg(stegdata, cipher, verbose=False):
+# Reassembles the cipher data carried by an array of unprepped steg packets for cipher
+# (anything but none) and returns it as a read only buffer the ciphers can use directly
+# The packets can be in any order, the status byte of each one gives its place in the
+# transmission (see createciphermsgs_packer_xor and createciphermsgs_packer_other) and its
+# 8 bytes go straight to that place in one preallocated buffer, packet n fills bytes 8n to 8n+8
+#   first packet - 0x80 | total packets, 128 packets leave the count as 0 (0x80 | 0x40 | bytes to
+#                  read for a single packet message of the ciphers that mark their last packet)
+#   last packet - 0x40 | bytes to read, only for the ciphers that mark their last packet
+#   other packets - the packet number, 6 bits for the ciphers that mark their last packet
+#                   and 7 bits for the others
+    stegbytes = jt65tobytes_batch(stegdata)
+    lastpacketlength = cipher in CIPHERS and CIPHERS[cipher].lastpacketlength
+    numberbits = 0x3F if lastpacketlength else 0x7F
+
+    status = stegbytes[:, 0]
+    first = status & 0x80 != 0
+    last = ~first & (status & 0x40 != 0) if lastpacketlength else np.zeros(len(status), dtype=bool)
+
+    # The first packet says how many packets there are, without it assume they all arrived
+    total = len(stegbytes)
+    for thisstatus in status[first]:
+        total = thisstatus & 0x7F or 128
+        if lastpacketlength and thisstatus & 0x40 and thisstatus & 0x3F:
+            total = 1  # Single packet message
+            last |= first
+    slots = np.where(first, 0, np.where(last, total - 1, status & numberbits))
+
+    cipherlength = total * 8
+    for slot, thisstatus in zip(slots[last], status[last]):
+        # This is the last packet, signals how many bytes to read
+        cipherlength = slot * 8 + min(thisstatus & 0x3F, 8)
 
-        finalcipherdata = (
-            ''.join('{0:02x}'.format(int(e)).decode("hex") for e in stegedmsgba))
+    if verbose:
+        for slot, thesebytes in zip(slots, stegbytes):
+            print "Steg Data in Message " + str(slot) + " : " + str(thesebytes[1:])
 
-        if verbose:
-            print"Cipher Data Hex : " + finalcipherdata
+    cipherarray = np.zeros((max(total, slots.max() + 1 if len(slots) else 0), 8), dtype=np.uint8)
+    cipherarray[slots] = stegbytes[:, 1:]
+    cipherbuffer = bytearray(cipherarray.tobytes())
+    finalcipherdata = buffer(cipherbuffer, 0, cipherlength)
 
-        if aesmode == "ECB":
-            cryptobj = AES.new(key, AES.MODE_ECB)
-        elif aesmode == "CBC":
-            cryptobj = AES.new(key, AES.MODE_CBC, finalcipherdata[0:16])
-            finalcipherdata = finalcipherdata[16:]
-        elif aesmode == "CFB":
-            cryptobj = AES.new(key, AES.MODE_CFB, finalcipherdata[0:16])
-            finalcipherdata = finalcipherdata[16:]
+    if verbose:
+        print "Cipher Data : " + str(list(cipherbuffer[:cipherlength]))
+        print "Cipher Data Hex : " + binascii.hexlify(finalcipherdata)
 
-        stegedmsg = cryptobj.decrypt(finalcipherdata)
+    return finalcipherdata
 
-    if cipher == "GPG":
-        if verbose:
-            print"Cipher Data : " + str(stegedmsgba)
 
-        finalcipherdata = (
-            ''.join('{0:02x}'.format(int(e)).decode("hex") for e in stegedmsgba))
+def deciphersteg(stegdata, cipher, key, aesmode, verbose=False, unprep=True):
+# Decipher hidden message from array of data hidden in JT65 errors
+    if unprep and len(stegdata):
+        stegdata = jt.unprepsteg_batch(stegdata)[0]  # Decode real data from FEC
+
+    cipherobj = getcipher(cipher, key, aesmode)
+    if cipherobj is None:
+        return ""
+
+    return cipherobj.deciphersteg(stegdata, verbose)
+
+
+# Status byte framing of the steg streams from stegencoder, there is no limit on the
+# number of packets so there is no MAX_MULTI_PACKET_STEG_BYTES for streams
+#   first packet - STREAM_START is set
+#   last packet - STREAM_END is set, it carries up to 7 bytes and its eighth byte is how many
+#   every packet - the low 6 bits are the packet number (the first packet is 0) modulo 64
+# A message that fits in one packet sets both STREAM_START and STREAM_END
+# Numbering the last packet as well lets stegdecoder tell when the packet before it is missing
+STREAM_START = 0x80
+STREAM_END = 0x40
+STREAM_LOW_BITS = 0x3F
+
+
+class StreamCipher(object):
+# Encrypts or decrypts a steg stream piece by piece for stegencoder and stegdecoder
+# with the cipher object from getcipher
+# update() returns the processed data that is ready, finish() the rest at the end
+# Ciphers with a streamblock (AES ECB and CBC) hold partial blocks back until more data
+# arrives, the last one is padded with spaces like createciphermsgs does
+# Streams of ciphers with an IV start with it, header holds it when encrypting
+
+    def __init__(self, cipher, key, aesmode, encrypt):
+        if cipher in CIPHERS and not CIPHERS[cipher].streamable:
+            print cipher + " messages can not be streamed, send them without streaming"
+            sys.exit(0)
+
+        self.cipherobj = getcipher(cipher, key, aesmode)
+        if self.cipherobj is None:
+            print "Unsupported cipher for steg streams : " + cipher
+            sys.exit(0)
+
+        self.encrypt = encrypt
+        self.header = ""
+        self.pending = ""
+        self.cryptobj = None
+
+        if encrypt:
+            self.header = self.cipherobj.newiv()
+        if encrypt or not self.cipherobj.ivsize:
+            self.cryptobj = self.cipherobj.newcryptobj(self.header)
+        # otherwise when decrypting the Crypto object is made once the IV has arrived
+
+    def update(self, data):
+        self.pending += data
+
+        if self.cryptobj is None:
+            ivsize = self.cipherobj.ivsize
+            if len(self.pending) < ivsize:
+                return ""
+            self.cryptobj = self.cipherobj.newcryptobj(self.pending[:ivsize])
+            self.pending = self.pending[ivsize:]
+
+        ready = len(self.pending)
+        ready -= ready % self.cipherobj.streamblock
+        data = self.pending[:ready]
+        self.pending = self.pending[ready:]
+
+        if not data:
+            return data
+
+        if self.encrypt:
+            return self.cryptobj.encrypt(data)
+        return self.cryptobj.decrypt(data)
+
+    def finish(self):
+        if self.encrypt and self.pending:
+            return self.update(" " * (-len(self.pending) % self.cipherobj.streamblock))
+        return ""  # an incomplete block at the end of a received stream can not be decrypted
+
+
+def streampacket(number, data, last):
+# returns the 20 symbol steg packet (with FEC) of packet number of a steg stream
+# data holds up to 8 bytes (7 for the last packet), short packets are filled out with random bytes
+    status = number & STREAM_LOW_BITS
+    if number == 0:
+        status = status | STREAM_START
+    if last:
+        status = status | STREAM_END
+
+    length = len(data)
+    data = list(bytearray(data))
+    data += [random.randint(0, 255) for i in range(8 - len(data))]
+    if last:
+        data[7] = length
+    return jt.prepsteg(bytes8tojt65(data, status))
+
+
+def stegencoder(stegmsg, cipher, key, aesmode="ECB", verbose=False):
+# Generator yielding the steg packets (with FEC) of a hidden message as a steg stream
+# stegmsg is a string or any iterable of strings, such as an open file, and is only read
+# as far as needed for the next packet so messages of any length can be streamed
+# Supports the none, XOR, ARC4, AES and OTP ciphers, the result is read by stegdecoder
+    if isinstance(stegmsg, basestring):
+        stegmsg = [stegmsg]
+
+    streamer = StreamCipher(cipher, key, aesmode, True)
+    ready = streamer.header
+    number = 0
+
+    for chunk in stegmsg:
+        ready += streamer.update(chunk)
+
+        # Always keep some data back, the last packet has to carry the end of the stream
+        while len(ready) > 7:
+            if verbose:
+                print "Steg stream packet " + str(number) + " : " + repr(ready[:8])
+            yield streampacket(number, ready[:8], False)
+            ready = ready[8:]
+            number += 1
 
-        if verbose:
-            print"Cipher Data Hex : " + finalcipherdata
+    ready += streamer.finish()
+    while len(ready) > 7:
+        yield streampacket(number, ready[:8], False)
+        ready = ready[8:]
+        number += 1
 
-        gpg = GPG()
-        stegedmsg = gpg.decrypt(finalcipherdata)
-        stegedmsg = str(stegedmsg)
+    if verbose:
+        print "Steg stream last packet " + str(number) + " : " + repr(ready)
+    yield streampacket(number, ready, True)
 
-    if cipher == "OTP":
-        finalcipherdata = (''.join(chr(e) for e in stegedmsgba))
 
-        if verbose:
-            print"Cipher Data : " + str(finalcipherdata)
+def stegdecoder(stegdata, cipher, key, aesmode="ECB", verbose=False, unprep=True):
+# Generator yielding the hidden message of a steg stream from stegencoder piece by piece
+# as the packets in stegdata are consumed, stegdata can be any iterable of steg packets
+# Packets received before the first packet of a stream are skipped and decoding stops
+# at the last packet or when a packet turns out to be missing
+    streamer = None
+    number = 0
 
-        stegedmsg = otp_decode(str(finalcipherdata), key)
+    for value in stegdata:
+        if unprep:
+            value = jt.unprepsteg(np.copy(value))  # Decode real data from FEC
+        thesebytes = jt65tobytes(value)
+        status = thesebytes[0]
+
+        if streamer is None:
+            if not status & STREAM_START:
+                if verbose:
+                    print "Monitored steg stream mid-transmission, skipping packet"
+                continue
+            streamer = StreamCipher(cipher, key, aesmode, False)
+
+        elif status & STREAM_START or status & STREAM_LOW_BITS != number & STREAM_LOW_BITS:
+            print "Steg stream packet " + str(number) + " is missing, the rest of the message can not be decoded"
+            return
+
+        if status & STREAM_END:
+            data = str(bytearray(thesebytes[1:1 + min(thesebytes[8], 7)].tolist()))
+        else:
+            data = str(bytearray(thesebytes[1:].tolist()))
 
-    return stegedmsg
+        if verbose:
+            print "Steg stream packet " + str(number) + " : " + repr(data)
+
+        plaintext = streamer.update(data)
+        if status & STREAM_END:
+            plaintext += streamer.finish()
+        if plaintext:
+            yield plaintext
+        if status & STREAM_END:
+            return
+        number += 1
@@ -20,14 +20,13 @@
 
 import sys
 import argparse
-import copy
 import time
 import datetime
 import subprocess
 import os
 import time
 import thread
-import colorama
+import itertools
 import numpy as np
 import jt65stego as jts
 import jt65sound
@@ -52,6 +51,10 @@ def ValidateArguments(args):
         print("Cannot use both --interactive and --decode at the same time!")
         sys.exit(0)
 
+    if args.interactive and args.stream:
+        print("Cannot use --stream with --interactive yet, streams can only be sent and decoded in one go")
+        sys.exit(0)
+
     if not args.interactive and not args.encode and not args.decode:
         print("Nothing to do, use --encode, --decode, or --interactive")
         print("or --help to see all available options")
@@ -68,7 +71,7 @@ def SetArgumentDefaults(args):
         args.stdin = True
 
 
-def processoutput(finalmsgs, stdout, wavout, wsjt, freq, mode, verbose):
+def processoutput(finalmsgs, stdout, wavout, wsjt, freq, mode, verbose, workers=1):
 # Send JT65 messages to output specified by user
     if stdout:
         np.set_printoptions(linewidth=300)
@@ -93,24 +96,29 @@ def processoutput(finalmsgs, stdout, wavout, wsjt, freq, mode, verbose):
         if wavout.endswith('.wav'):
             wavout = wavout[:-4]
 
+        filenames = []
         for index, value in enumerate(finalmsgs):
             filename = wavout + "-" + \
                 str(index).zfill(3) + ".wav"  # Creates -000.wav, -001.wav, etc
 
-            if verbose:
-                print "Generating audio file " + str(index) + " : " + filename
+            if wavout == '-':
+                filename = sys.__stdout__  # Streams the wav files one after the other
 
-            if wavmode == 1 and freq == 1270.5 and mode == 'A':
-                jt65sound.outputwavfilequick(filename, value)
+            filenames.append(filename)
 
-            else:
-                tones = jt65sound.toneswithsync(value, jt65mode, offset)
-                jt65sound.outputwavfile(filename, tones, wavmode)
+        # Files are rendered across the worker processes but always reported in order
+        wavfiles = jt65sound.outputwavfiles(filenames, finalmsgs, jt65mode, offset, wavmode, workers)
+        for index, (filename, seconds) in enumerate(wavfiles):
+            if verbose:
+                print "Generated audio file " + str(index) + " : " + str(getattr(filename, 'name', filename)) + \
+                    " in " + "%.3f" % seconds + " s"
 
 
 def processinput(stdin, wavin, verbose):
-# Process input from stdin or wavs and return array of JT65 data
+# Process input from stdin or wavs and return array of JT65 data and the symbol confidence
+# the decoder gave for it (None from stdin, which carries symbols only)
     JT65data = []
+    confidence = None
 
     if stdin:
         stdinput = sys.stdin.readlines()
@@ -132,16 +140,14 @@ def processinput(stdin, wavin, verbose):
 
     elif wavin:
         wavfiles = wavin.split(",")
+        confidence = []
 
         for index, value in enumerate(wavfiles):
             messages = jt65sound.inputwavfile(value, verbose)
+            JT65data.extend(messages['symbols'])
+            confidence.extend(messages['confidence'])
 
-            for currentmsg in messages:
-                symbols, confidence, msg, s2db, freq, a1, a2 = currentmsg
-                numpymsg = np.array(symbols)
-                JT65data.append(numpymsg)
-
-    return JT65data
+    return JT65data, confidence
 
 
 def performwavdecode(filename, stegcollection):
@@ -150,24 +156,20 @@ def performwavdecode(filename, stegcollection):
     messages = jt65sound.inputwavfile(filename, verbose=args.verbose)
 
     for currentmsg in messages:
-        symbols, confidence, msg, s2db, freq, a1, a2 = currentmsg
-        numpymsg = np.array(symbols)
-        jt65data = []
-        jt65data.append(numpymsg)
-        jt65datacopy = copy.deepcopy(
-            jt65data)  # Necessary on some version of Python due to 'unprepmsg' not preserving list
+        symbols = currentmsg['symbols']
+        jt65data = [symbols]
 
         # Retrieve JT65 valid messages
-        jt65msgs = jts.decodemessages(jt65data, args.verbose)
+        jt65msgs = jts.decodemessages(jt65data, args.verbose, [currentmsg['confidence']])
 
         if STEG_ENABLED:
-            containssteg = jts.validatesteg(
-                jt65msgs[0], symbols, hidekey, STEG_DETECTION_ERROR_THRESHOLD, args.verbose)
+            errors, keyerrors, nerr = jts.screensteg(jt65data, hidekey, [currentmsg['confidence']])
+            containssteg = keyerrors[0] >= STEG_DETECTION_ERROR_THRESHOLD
 
         if containssteg:
             # Retrieve steg message
             stegdata = jts.retrievesteg(
-                jt65datacopy, hidekey, args.verbose, True)  # Unprep the steg to get actual bytes
+                jt65data, hidekey, args.verbose, True)  # Unprep the steg to get actual bytes
             stegcollection.append(stegdata[0])
 
             # Determine if we have a steg result
@@ -179,6 +181,7 @@ def performwavdecode(filename, stegcollection):
                     :] = []  # Reset the steg collection for the next incoming message
 
         # Print result
+        usecolor()
         for index, value in enumerate(jt65msgs):
             print "\nDecoded JT65 message " + str(index) + " : " + colorama.Fore.BLUE + value + colorama.Fore.RESET
 
@@ -221,6 +224,14 @@ def getstegresult(stegcollection, cipher, key, aesmode, verbose):
 def getstatusbyte(steglist):
     return steglist[0]
 
+
+def usecolor():
+# Imports and initializes colorama the first time colored output is printed
+    global colorama
+    if colorama is None:
+        import colorama
+        colorama.init()
+
 # Command line argument setup
 parser = argparse.ArgumentParser(
     description='Steganography tools for JT65 messages.',
@@ -236,6 +247,10 @@ groupCommands.add_argument(
     '--decode', action='store_true', help='Decode msg(s)')
 groupOptions.add_argument('--noise', type=int, default=0,
                           metavar='<noise>', help='Amount of cover noise to insert (default: 0)')
+groupOptions.add_argument('--seed', type=int, metavar='<seed>',
+                          help='Seed for the cover noise so the output can be reproduced')
+groupOptions.add_argument('--workers', type=int, default=1, metavar='<workers>',
+                          help='Processes used to encode the JT65 messages and render wav files (default: 1)')
 groupOptions.add_argument('--interactive', action='store_true',
                           help='Interactive mode, monitor audio line in and decode')
 groupOptions.add_argument(
@@ -249,6 +264,8 @@ groupOptions.add_argument(
         'A', 'B', 'C'], help='Supported JT65 modes are A, B, and C (default: A)')
 groupOptions.add_argument(
     '--verbose', action='store_true', help='Verbose output')
+groupEncryption.add_argument('--stream', action='store_true',
+                             help='Send or read the hidden message as a steg stream with no size limit (not for GPG)')
 groupEncryption.add_argument('--cipher', default='none', metavar='<type>', choices=[
                              'none', 'XOR', 'ARC4', 'AES', 'GPG', 'OTP'], help='Supported ciphers are none, XOR, ARC4, AES, GPG, OTP (default: none)')
 groupEncryption.add_argument(
@@ -260,7 +277,7 @@ groupEncryption.add_argument('--aesmode', default='ECB', metavar='<mode>', choic
 groupEncodeOutput.add_argument(
     '--stdout', action='store_true', help='Output to terminal (default)')
 groupEncodeOutput.add_argument('--wavout', metavar='<file1.wav>',
-                               help='Output to wav file(s) - Multiple files suffix -000.wav, -001.wav...')
+                               help='Output to wav file(s) - Multiple files suffix -000.wav, -001.wav... or - for stdout')
 groupEncodeOutput.add_argument('--wsjt', action='store_true',
                                help='Output wav file compatible with WSJT instead of WSJT-X')
 groupDecodeInput.add_argument(
@@ -269,14 +286,18 @@ groupDecodeInput.add_argument(
     '--wavin', metavar='<file1.wav(,file2.wav)(,file3.wav)...>', help='Input from wav file(s)')
 args = parser.parse_args()
 
-colorama.init()
+colorama = None  # loaded by usecolor()
 
 # Check arguments to make sure we have everything we need and there are no
 # contradictory commands
 ValidateArguments(args)
 SetArgumentDefaults(args)
 
+if args.wavout == '-':
+    sys.stdout = sys.stderr  # Messages go to stderr so only the wav files are written to stdout
+
 if not args.key:
+    usecolor()
     print colorama.Fore.RED + "No steg symbol key provided, steganography mode disabled" + colorama.Fore.RESET
     STEG_ENABLED = False
 else:
@@ -288,53 +309,60 @@ if args.encode:
     jt65msgs = args.jt65msg.split(',')
 
     # Create array of valid JT65 data
-    jt65data = jts.jt65encodemessages(jt65msgs, args.verbose)
+    jt65data = jts.jt65encodemessages(jt65msgs, args.verbose, args.workers)
 
     if args.stegmsg != "" and STEG_ENABLED:
         # Create array of cipher data to hide
-        cipherdata = jts.createciphermsgs(
-            len(jt65data), args.stegmsg, args.cipher, args.key, args.recipient, args.aesmode, args.verbose)
+        if args.stream:
+            cipherdata = list(itertools.islice(jts.stegencoder(
+                args.stegmsg, args.cipher, args.key, args.aesmode, args.verbose), len(jt65data) + 1))
+            if len(cipherdata) > len(jt65data):
+                print "Length of hidden message exceeds capacity of number of valid JT65 messages provided"
+                sys.exit(0)
+        else:
+            cipherdata = jts.createciphermsgs(
+                len(jt65data), args.stegmsg, args.cipher, args.key, args.recipient, args.aesmode, args.verbose)
 
         # Embed steg data in JT65 messages
         finalmsgs = jts.steginject(
-            jt65data, args.noise, cipherdata, hidekey, args.verbose)
+            jt65data, args.noise, cipherdata, hidekey, args.verbose, args.seed)
 
     else:
         # No steg data to hide, just add cover noise if specified
-        finalmsgs = []
-        for msg in jt65data:
-            finalmsgs.append(
-                jts.randomcover(msg, [], args.noise, args.verbose))
+        finalmsgs = list(jts.randomcover_batch(jt65data, args.noise, args.seed, verbose=args.verbose))
 
     # Send to output
-    processoutput(finalmsgs, args.stdout, args.wavout, args.wsjt, args.freq, args.mode, args.verbose)
+    processoutput(finalmsgs, args.stdout, args.wavout, args.wsjt, args.freq, args.mode, args.verbose, args.workers)
 
 # Decode
 elif args.decode:
     stegpresent = False
 
     # Process input to JT numpy arrays
-    jt65data = processinput(args.stdin, args.wavin, args.verbose)
-    jt65datacopy = copy.deepcopy(jt65data)
+    jt65data, confidence = processinput(args.stdin, args.wavin, args.verbose)
     jt65stegmsgs = []
 
     # Retrieve JT65 valid messages
-    jt65msgs = jts.decodemessages(jt65data, args.verbose)
+    jt65msgs = jts.decodemessages(jt65data, args.verbose, confidence)
 
     if STEG_ENABLED:
-        for i in range(len(jt65datacopy)):
-            if jts.validatesteg(jt65msgs[i], jt65datacopy[i], hidekey, STEG_DETECTION_ERROR_THRESHOLD, args.verbose):
-                jt65stegmsgs.append(jt65datacopy[i])
-                stegpresent = True
+        errors, keyerrors, nerr = jts.screensteg(jt65data, hidekey, confidence)
+        for i in np.flatnonzero(keyerrors >= STEG_DETECTION_ERROR_THRESHOLD):
+            jt65stegmsgs.append(jt65data[i])
+            stegpresent = True
 
     # Retrieve steg message
     stegdata = jts.retrievesteg(jt65stegmsgs, hidekey, args.verbose)
 
     # Decipher steg message
-    stegmsg = jts.deciphersteg(
-        stegdata, args.cipher, args.key, args.aesmode, args.verbose)
+    if args.stream:
+        stegmsg = ''.join(jts.stegdecoder(stegdata, args.cipher, args.key, args.aesmode, args.verbose))
+    else:
+        stegmsg = jts.deciphersteg(
+            stegdata, args.cipher, args.key, args.aesmode, args.verbose)
 
     # Print result
+    usecolor()
     for index, value in enumerate(jt65msgs):
         print "\nDecoded JT65 message " + str(index) + " : " + colorama.Fore.BLUE + value + colorama.Fore.RESET
     if stegpresent:
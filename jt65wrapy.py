@@ -18,10 +18,22 @@
 #    with this program; if not, write to the Free Software Foundation, Inc.,
 #    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
+import collections
 import numpy
 import JT65
-import subprocess
-import os
+import threading
+import wave
+
+DECODE_SAMPLES = 52 * 12000  # samples handed to the decoder, same as the jt65 binary
+
+# One record per decode from decodewav, fields are in the order of the lists it used to return
+DECODE_DTYPE = numpy.dtype([('symbols', numpy.uint8, 63), ('confidence', numpy.uint8, 63), ('msg', 'S22'),
+                            ('s2db', numpy.float32), ('freq', numpy.float32), ('a1', numpy.float32),
+                            ('a2', numpy.float32)])
+
+SYMBOL_CACHE_SIZE = 4096  # messages and payloads kept by symbolcache
+
+decodelock = threading.Lock()
 
 
 def encode(message):
@@ -31,6 +43,16 @@ def encode(message):
     return output
 
 
+def encode_batch(messages):
+# return an (N,12) numpy array of JT65 message symbols, one row per message
+# in messages, packed with a single call into the JT65 library
+    msgs = numpy.array([msg.ljust(22)[:22] for msg in messages], dtype='S22')
+    if len(msgs) == 0:
+        return numpy.zeros((0, 12), dtype=numpy.int32)
+    output = JT65.jt65packmsgbatch(msgs.view('S1').reshape(len(msgs), 22))
+    return output.T
+
+
 def decode(recarray):
 # returns a string decoded from the 12 element recarray received
     output = numpy.array(range(22), 'c')
@@ -47,18 +69,127 @@ def prepmsg(message):
     return output
 
 
-def unprepmsg(recvd):
+def prepmsg_batch(messages):
+# return an (N,63) array of channel symbols from an (N,12) array of JT65 message symbols
+# same as prepmsg but every packet is processed in a single call into the JT65 library
+    messages = numpy.atleast_2d(numpy.asarray(messages, dtype=numpy.int32))
+    if messages.size == 0:
+        return numpy.zeros((0, 63), dtype=numpy.int32)
+    output = JT65.prepmsgbatch(messages.T)
+    return output.T
+
+
+def unprepmsg(recvd, confidence=None):
 # return an array of 6 bit symbols representing a JT65 message from the supplied recvd packet
 # recvd packet is a numpy array of range 63 containing a prepped or received JT65 packet
 # will do interleave removal, graycode removal and Reed Solomon decoding
+# if the confidence of each received symbol from the decoder is supplied the least reliable
+# symbols are treated as erasures, which lets packets with more errors decode
 # WARNING!!! - recvd is NOT preserved during this call remember to save
-# and restore it
+# and restore it (unless confidence is supplied)
+
+    if confidence is not None:
+        output, nerr = JT65.unprepmsgera(recvd, confidence)
+        return output
 
     output = numpy.array(range(12), dtype=numpy.int32)  # array to return
     JT65.unprepmsg(recvd, output)
     return output
 
 
+def unprepmsg_batch(recvd, confidence=None):
+# return an (N,12) array of 6 bit JT65 message symbols and an (N,) array of corrected
+# error counts from an (N,63) array of prepped or received JT65 packets
+# an error count of -1 means the packet could not be decoded
+# confidence is an optional (N,63) array of symbol confidence used for erasures as in unprepmsg
+# unlike unprepmsg recvd IS preserved during this call
+    recvd = numpy.atleast_2d(numpy.asarray(recvd, dtype=numpy.int32))
+    if recvd.size == 0:
+        return numpy.zeros((0, 12), dtype=numpy.int32), numpy.zeros(0, dtype=numpy.int32)
+    if confidence is not None:
+        confidence = numpy.atleast_2d(numpy.asarray(confidence, dtype=numpy.int32))
+        output, nerr = JT65.unprepmsgerabatch(recvd.T, confidence.T)
+    else:
+        output, nerr = JT65.unprepmsgbatch(recvd.T)
+    return output.T, nerr
+
+
+class LRUCache(object):
+# Size bounded least recently used cache shared by SymbolCache and jt65sound.ToneTableCache
+# hits, misses and evictions count lookups since the cache was created or cleared
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+    # empties the cache and resets the counters
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def _lookup(self, key, count=True):
+    # returns the value cached for key, None if there is none
+    # count=False leaves the lookup out of the counters
+        with self.lock:
+            value = self.entries.pop(key, None)
+            if value is not None:
+                self.entries[key] = value  # most recently used goes to the end
+            if count:
+                if value is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+            return value
+
+    def _store(self, key, value):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = value
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+
+class SymbolCache(LRUCache):
+# Size bounded least recently used cache of the 63 canonical channel symbols of a JT65
+# message keyed both by message text and by the 12 symbol payload from encode/unprepmsg
+# The arrays returned are shared between callers so they are read only
+
+    def __init__(self, maxsize=SYMBOL_CACHE_SIZE):
+        LRUCache.__init__(self, maxsize)
+
+    def frompayload(self, payload, count=True):
+    # returns prepmsg(payload) for the 12 symbol JT65 payload
+    # count=False leaves the lookup out of the counters, frommessage has already counted it
+        key = ('payload', tuple(int(symbol) for symbol in payload))
+        symbols = self._lookup(key, count)
+        if symbols is None:
+            symbols = prepmsg(numpy.array(key[1], dtype=numpy.int32))
+            symbols.flags.writeable = False
+            self._store(key, symbols)
+        return symbols
+
+    def frommessage(self, message):
+    # returns prepmsg(encode(message)) for the JT65 message text
+        key = ('message', message)
+        symbols = self._lookup(key)
+        if symbols is None:
+            symbols = self.frompayload(encode(message), False)
+            self._store(key, symbols)
+        return symbols
+
+
+symbolcache = SymbolCache()
+
+
 def prepsteg(message):
 # return an array of 6 bit symbols preped for transmission on the channel as a 20 symbol steg packet
 # will do Reed Solomon coding
@@ -79,42 +210,79 @@ def unprepsteg(recvd):
     return output
 
 
+def unprepsteg_batch(recvd):
+# return an (N,12) array of 6 bit steg message symbols and an (N,) array of corrected
+# error counts from an (N,20) array of prepped or received steg packets
+# an error count of -1 means the packet could not be decoded
+# unlike unprepsteg recvd IS preserved during this call
+    recvd = numpy.atleast_2d(numpy.asarray(recvd, dtype=numpy.int32))
+    if recvd.size == 0:
+        return numpy.zeros((0, 12), dtype=numpy.int32), numpy.zeros(0, dtype=numpy.int32)
+    output, nerr = JT65.unprepstegbatch(recvd.T)
+    return output.T, nerr
+
+
+def decodepcm(samples):
+# Decodes JT65 audio already in memory through the jt65a decoder compiled into the JT65 module
+# samples is any contiguous buffer of 12000 Hz mono audio, int16 and float32 arrays are handed
+# to the decoder as they are, anything else is converted to float32 first
+# Only the first 52 seconds are decoded, shorter buffers are padded with silence
+# Returns a tuple of arrays (symbols, confidence, stats, msgs) with one row per decode:
+#   symbols - (N,63) received channel symbols
+#   confidence - (N,63) confidence of each received symbol
+#   stats - (N,4) s2db, freq, a1 and a2 from the decoder
+#   msgs - (N,) decoded message strings
+    samples = numpy.asarray(samples)
+    if samples.dtype == numpy.int16:
+        decoder = JT65.jt65decode16
+        samples = numpy.ascontiguousarray(samples.ravel())
+    else:
+        decoder = JT65.jt65decode
+        samples = numpy.ascontiguousarray(samples.ravel(), dtype=numpy.float32)
+
+    if len(samples) == 0:
+        samples = numpy.zeros(1, dtype=samples.dtype)
+
+    # The decoder keeps state in Fortran SAVE variables and FFTW plans so only one
+    # decode can run at a time per process
+    with decodelock:
+        symbols, confidence, stats, msgs, ndecoded = decoder(samples)
+
+    msgs = [''.join(msg) for msg in msgs[:ndecoded]]
+    return symbols[:, :ndecoded].T, confidence[:, :ndecoded].T, stats[:, :ndecoded].T, msgs
+
+
+def decodewav_arrays(wavfile):
+# Decodes a JT65 wav file in-process, see decodepcm for the arrays returned
+    wav = wave.open(wavfile, "r")
+    frames = wav.readframes(DECODE_SAMPLES)
+    wav.close()
+
+    return decodepcm(numpy.frombuffer(frames, dtype=numpy.int16))
+
+
+def decoderecords(symbols, confidence, stats, msgs):
+# returns a DECODE_DTYPE structured array with one record per decode from the
+# symbols, confidence, stats and msgs of decodepcm
+    decodes = numpy.zeros(len(msgs), dtype=DECODE_DTYPE)
+    decodes['symbols'] = symbols
+    decodes['confidence'] = confidence
+    decodes['msg'] = [msg.strip() for msg in msgs]
+    if len(msgs):
+        decodes['s2db'], decodes['freq'], decodes['a1'], decodes['a2'] = numpy.transpose(stats)
+    return decodes
+
+
 def decodewav(wavfile):
-# Returns symbol list, confidence, and decoded msg string from JT65 wav file
-# Calls the jt65 binary through subprocess (created from jt65.f90)
-# Possibly in the future interface directly with the fortran via f2py
-    messages = []
-    symbols = []
-    confidence = []
-    jt65msg = ""
-
-    with open("decodetemp.txt", "w+") as f:
-        subprocess.call(["./jt65", wavfile], stdout=f)
-
-        f.seek(0)  # Reset to start reading from beginning of file
-        linecount = sum(1 for _ in f)  # Get linecount
-
-        f.seek(0)  # Reset to start reading from beginning of file
-        error = False
-        while linecount >= 3 and not error:
-            symbols = map(int, f.readline().strip().replace("  ", " ")
-                          .replace("   ", " ").replace("\n", "").strip().split(" "))
-            confidence = map(int, f.readline().strip().replace(
-                "   ", " ").replace("  ", " ").replace("\n", "").strip().split(" "))
-            msgandstats = f.readline().strip().replace("\n", "").split(",")
-            try:
-                jt65msg, s2db, freq, a1, a2 = msgandstats
-            except:
-                error = True
-                jt65msg = "ERROR DECODE"
-                s2db = "1"
-                freq = "0"
-                a1 = "0"
-                a2 = "0"
-            messages.append(
-                [symbols, confidence, jt65msg.strip(), s2db.strip(), freq.strip(), a1.strip(), a2.strip()])
-            linecount = linecount - 3
-
-    os.remove("decodetemp.txt")
-
-    return messages
+# Returns symbols, confidence, and decoded msg string from JT65 wav file
+# as a DECODE_DTYPE structured array with one record per decode
+# Records index and unpack like the old [symbols, confidence, jt65msg, s2db, freq, a1, a2] lists
+    return decoderecords(*decodewav_arrays(wavfile))
+
+
+def packetsymbols(packet):
+# returns the channel symbols of packet which is either an array of symbols
+# or a decode record (or array of records) from decodewav
+    if getattr(packet, 'dtype', None) is not None and packet.dtype.names:
+        return packet['symbols']
+    return packet
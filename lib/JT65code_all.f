@@ -4,3 +4,4 @@
 	include 'jt65unprep.f'
 	include 'jt65prepsteg.f'
 	include 'jt65unprepsteg.f'
+	include 'jt65batch.f'
@@ -16,7 +16,7 @@ subroutine ccf65(ss,nhsym,ssmax,sync1,dt1,flipk,syncshort,snr2,dt2)
   integer npr(126)
   data first/.true./
   equivalence (s,cs),(pr,cpr),(s2,cs2),(pr2,cpr2)
-  save
+  save first,pr,pr2                !A bare save leaves the equivalenced pr,pr2 on the stack
 
 ! The JT65 pseudo-random sync pattern:
   data npr/                                        &
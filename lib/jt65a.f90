@@ -11,6 +11,7 @@ subroutine jt65a(dd,npts,newdat,nutc,nf1,nf2,nfqso,ntol,nagain,ndecoded)
   logical done(NSZ)
   real a(5)
   character decoded*22
+  include 'jt65decodes.f90'
   save
 
   if(newdat.ne.0) then
@@ -40,7 +41,7 @@ subroutine jt65a(dd,npts,newdat,nutc,nf1,nf2,nfqso,ntol,nagain,ndecoded)
 
      do i=ia,ib                               !Search over freq range
         freq=i*df
-        if(savg(i).lt.thresh0 .or. done(i)) cycle
+        if(.not.(savg(i).ge.thresh0) .or. done(i)) cycle   !Also skips NaN (silence)
 
         call timer('ccf65   ',0)
         call ccf65(ss(1,i),nhsym,savg(i),sync1,dt,flipk,syncshort,snr2,dt2)
@@ -49,7 +50,7 @@ subroutine jt65a(dd,npts,newdat,nutc,nf1,nf2,nfqso,ntol,nagain,ndecoded)
         ftest=abs(freq-freq0)
         thresh1=1.0
         if(nqd.eq.1 .and. ntol.le.100) thresh1=0.
-        if(sync1.lt.thresh1 .or. ftest.lt.ftol) cycle
+        if(.not.(sync1.ge.thresh1) .or. ftest.lt.ftol) cycle
 
         nflip=nint(flipk)
         call timer('decod65a',0)
@@ -66,7 +67,17 @@ subroutine jt65a(dd,npts,newdat,nutc,nf1,nf2,nfqso,ntol,nagain,ndecoded)
 
         if(decoded.ne.'                      ') then
 !           print *, decoded 
-          print *, decoded, ",", sync2, ",",  freq, ",",  a(1), ",",  a(2) !pdogg
+          if(ncollect.ne.0) then
+             if(ndecodes.lt.MAXDECODES) then
+                ndecodes=ndecodes+1
+                isymdec(:,ndecodes)=mrsymdec
+                iprobdec(:,ndecodes)=mrprobdec
+                statsdec(:,ndecodes)=(/sync2,freq,a(1),a(2)/)
+                msgdec(ndecodes)=decoded
+             endif
+          else
+             print *, decoded, ",", sync2, ",",  freq, ",",  a(1), ",",  a(2) !pdogg
+          endif
 !          ndecoded=1      <--- makes Pi segfault.. :)
 ! pdogg - this commented stuffstuff crashes debian... skipping it for now <<XXX>> fix
 !            nfreq=nint(freq+a(1))
@@ -0,0 +1,99 @@
+        subroutine jt65packmsgbatch(msgb,datb,nb)
+Cf2py threadsafe
+Cf2py intent(in) msgb
+Cf2py intent(out) datb
+Cf2py integer intent(hide),depend(msgb) :: nb=shape(msgb,0)
+
+! Pack nb messages into nb rows of 12 six-bit symbols in one call
+        integer nb
+        character*22 msgb(nb)
+        integer datb(12,nb)
+
+        do i=1,nb
+           call packmsg(msgb(i),datb(1,i))
+        enddo
+        return
+        end
+
+
+        subroutine prepmsgbatch(dgenb,sentb,nb)
+Cf2py threadsafe
+Cf2py intent(in) dgenb
+Cf2py intent(out) sentb
+Cf2py integer intent(hide),depend(dgenb) :: nb=shape(dgenb,1)
+
+! RS encode, interleave and graycode nb packets in one call
+        integer nb
+        integer dgenb(12,nb),sentb(63,nb)
+
+        do i=1,nb
+           call rs_encode(dgenb(1,i),sentb(1,i))
+           call interleave63(sentb(1,i),1)
+           call graycode(sentb(1,i),63,1)
+        enddo
+        return
+        end
+
+
+        subroutine unprepmsgbatch(sentb,recdb,nerrb,nb)
+Cf2py threadsafe
+Cf2py intent(in) sentb
+Cf2py intent(out) recdb
+Cf2py intent(out) nerrb
+Cf2py integer intent(hide),depend(sentb) :: nb=shape(sentb,1)
+
+! Remove graycode and interleave then RS decode nb packets in one call
+! sentb is left untouched, nerrb(i) is the number of corrected symbols
+! in packet i or -1 if it could not be decoded
+        integer nb
+        integer sentb(63,nb),recdb(12,nb),nerrb(nb)
+        integer sentu(63),erau(51)
+
+        do i=1,nb
+           sentu=sentb(:,i)
+           call graycode(sentu,63,-1)
+           call interleave63(sentu,-1)
+           call rs_decode(sentu,erau,0,recdb(1,i),nerrb(i))
+        enddo
+        return
+        end
+
+
+        subroutine unprepmsgerabatch(sentb,probb,recdb,nerrb,nb)
+Cf2py threadsafe
+Cf2py intent(in) sentb
+Cf2py intent(in) probb
+Cf2py intent(out) recdb
+Cf2py intent(out) nerrb
+Cf2py integer intent(hide),depend(sentb) :: nb=shape(sentb,1)
+
+! unprepmsgera for nb packets in one call, probb(:,i) is the confidence
+! of each symbol of packet i
+        integer nb
+        integer sentb(63,nb),probb(63,nb),recdb(12,nb),nerrb(nb)
+
+        do i=1,nb
+           call unprepmsgera(sentb(1,i),probb(1,i),recdb(1,i),nerrb(i))
+        enddo
+        return
+        end
+
+
+        subroutine unprepstegbatch(sentb,recdb,nerrb,nb)
+Cf2py threadsafe
+Cf2py intent(in) sentb
+Cf2py intent(out) recdb
+Cf2py intent(out) nerrb
+Cf2py integer intent(hide),depend(sentb) :: nb=shape(sentb,1)
+
+! RS decode nb steg packets in one call, sentb is left untouched
+        integer nb
+        integer sentb(20,nb),recdb(12,nb),nerrb(nb)
+        integer sentu(20),erau(20)
+
+        do i=1,nb
+           sentu=sentb(:,i)
+           call rs_stegdecode(sentu,erau,0,recdb(1,i),nerrb(i))
+        enddo
+        return
+        end
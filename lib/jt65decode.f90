@@ -0,0 +1,102 @@
+subroutine jt65decode(dd,n,isym,iprob,stats,msgs,ndec)
+
+! In-process entry point to the JT65 decoder for the JT65 f2py module.
+! Runs the same jt65a pipeline as the jt65 binary on the 12000 Hz samples
+! in dd(1:n) but returns the decodes instead of printing them to stdout.
+! When n covers the 52 s the decoder looks at, dd is used in place;
+! shorter buffers are zero padded like the binary does.
+! The decoder is not reentrant, callers must serialize calls (see
+! jt65wrapy.decodelock); the GIL is released while it runs.
+!   isym(:,i)   symbols of decode i as received (graycoded, interleaved)
+!   iprob(:,i)  confidence of each symbol of decode i
+!   stats(:,i)  sync2, freq, a(1), a(2) of decode i
+!   msgs(i)     decoded message text
+
+!f2py threadsafe
+!f2py intent(in) dd
+!f2py integer intent(hide),depend(dd) :: n=len(dd)
+!f2py intent(out) isym
+!f2py intent(out) iprob
+!f2py intent(out) stats
+!f2py intent(out) msgs
+!f2py intent(out) ndec
+
+  include 'jt65decodes.f90'
+  parameter (NZMAX=60*12000)
+  parameter (NPTS=52*12000)
+  real dd(n)
+  real ddpad(NZMAX)
+  integer isym(63,MAXDECODES),iprob(63,MAXDECODES)
+  real stats(4,MAXDECODES)
+  character*22 msgs(MAXDECODES)
+  save ddpad
+
+  if(n.ge.NPTS) then
+     call jt65decoderun(dd,isym,iprob,stats,msgs,ndec)
+  else
+     ddpad(1:n)=dd(1:n)
+     ddpad(n+1:)=0.
+     call jt65decoderun(ddpad,isym,iprob,stats,msgs,ndec)
+  endif
+
+  return
+end subroutine jt65decode
+
+subroutine jt65decode16(id2,n,isym,iprob,stats,msgs,ndec)
+
+! Same as jt65decode for 16 bit samples, converted to real the way the
+! jt65 binary converts the samples it reads from a wav file.
+
+!f2py threadsafe
+!f2py intent(in) id2
+!f2py integer intent(hide),depend(id2) :: n=len(id2)
+!f2py intent(out) isym
+!f2py intent(out) iprob
+!f2py intent(out) stats
+!f2py intent(out) msgs
+!f2py intent(out) ndec
+
+  include 'jt65decodes.f90'
+  parameter (NZMAX=60*12000)
+  parameter (NPTS=52*12000)
+  integer*2 id2(n)
+  real dd(NZMAX)
+  integer isym(63,MAXDECODES),iprob(63,MAXDECODES)
+  real stats(4,MAXDECODES)
+  character*22 msgs(MAXDECODES)
+  save dd
+
+  npts0=min(n,NPTS)
+  dd(1:npts0)=id2(1:npts0)
+  dd(npts0+1:)=0.
+  call jt65decoderun(dd,isym,iprob,stats,msgs,ndec)
+
+  return
+end subroutine jt65decode16
+
+subroutine jt65decoderun(dd,isym,iprob,stats,msgs,ndec)
+
+! Runs jt65a on the first 52 s of dd collecting the decodes
+
+  include 'jt65decodes.f90'
+  parameter (NZMAX=60*12000)
+  parameter (NPTS=52*12000)
+  real dd(NZMAX)
+  integer isym(63,MAXDECODES),iprob(63,MAXDECODES)
+  real stats(4,MAXDECODES)
+  character*22 msgs(MAXDECODES)
+
+  ncollect=1
+  ndecodes=0
+! Same arguments the jt65 binary ends up passing to jt65a
+  call jt65a(dd,NPTS,1,0,50,2700,933,0,0,ndecoded)
+  ncollect=0
+
+  ndec=ndecodes
+  isym=isymdec
+  iprob=iprobdec
+  stats=statsdec
+  msgs=msgdec
+
+  return
+end subroutine jt65decoderun
@@ -0,0 +1,10 @@
+! Decodes collected by jt65a/extract when the decoder runs in-process
+! through the JT65 f2py module instead of printing them to stdout
+      parameter (MAXDECODES=100)
+      integer ncollect,ndecodes
+      integer mrsymdec(63),mrprobdec(63)
+      integer isymdec(63,MAXDECODES),iprobdec(63,MAXDECODES)
+      real statsdec(4,MAXDECODES)
+      character*22 msgdec(MAXDECODES)
+      common/decodes/ncollect,ndecodes,mrsymdec,mrprobdec,isymdec,iprobdec,statsdec
+      common/decmsgs/msgdec
@@ -1,4 +1,5 @@
       subroutine jt65packmsg(msg,dat)
+Cf2py threadsafe
 Cf2py intent(in) msg
 Cf2py intent(inout) dat
       character*22 msg
@@ -1,4 +1,5 @@
         subroutine prepmsg(dgenp,sentp)
+!f2py threadsafe
 !f2py intent(in) dgenp
 !f2py intent(inout) sentp
 
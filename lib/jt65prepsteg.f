@@ -1,4 +1,5 @@
         subroutine prepsteg(dgenps,sentps)
+Cf2py threadsafe
 Cf2py intent(in) dgenps
 Cf2py intent(inout) sentps
 
@@ -1,4 +1,5 @@
       subroutine jt65unpackmsg(dat,msg)
+Cf2py threadsafe
 Cf2py intent(inout) msg
 Cf2py intent(in) dat
       integer dat(12)
@@ -1,4 +1,5 @@
          subroutine unprepmsg(sentup,recdup)
+Cf2py threadsafe
 
 !f2py intent(in) sentup
 !f2py intent(inout) recdup
@@ -9,3 +10,46 @@
          call rs_decode(sentup,eraup,0,recdup,nerr)
          return
          end
+
+
+        subroutine unprepmsgera(sentup,probup,recdup,nerr)
+Cf2py threadsafe
+Cf2py intent(in) sentup
+Cf2py intent(in) probup
+Cf2py intent(out) recdup
+Cf2py intent(out) nerr
+
+! Same as unprepmsg but uses the confidence of each received symbol
+! (probup, as returned with the symbols by the decoder) to erase the
+! least reliable symbols, sweeping the number of erasures the way
+! extract does. sentup is left untouched, nerr is the number of
+! corrected symbols or -1 if the packet could not be decoded
+        parameter (NEMAX=30)
+        integer sentup(63),probup(63),recdup(12)
+        integer sentu(63),probu(63),erau(51),indx(63)
+        real probr(63)
+
+        sentu=sentup
+        probu=probup
+        call graycode(sentu,63,-1)
+        call interleave63(sentu,-1)
+        call interleave63(probu,-1)
+
+        probr=probu
+        call indexx(63,probr,indx)
+        do i=1,NEMAX
+           j=indx(i)
+           if(probu(j).gt.120) then
+              ne2=i-1
+              go to 2
+           endif
+           erau(i)=63-j
+        enddo
+        ne2=NEMAX
+
+ 2      do nerase=0,ne2,2
+           call rs_decode(sentu,erau,nerase,recdup,nerr)
+           if(nerr.ge.0) return
+        enddo
+        return
+        end
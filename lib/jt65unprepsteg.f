@@ -1,4 +1,5 @@
         subroutine unprepsteg(sentups,recdups)
+Cf2py threadsafe
 
 Cf2py intent(in) sentups
 Cf2py intent(inout) recdups
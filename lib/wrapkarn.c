@@ -24,14 +24,22 @@
 #include <float.h>
 #include <limits.h>
 #include <stdlib.h>
+#include <pthread.h>
 #include "rs.h"
 #include "int.h"
 
 void *rs;
-static int first=1;
-
 void *rssteg;
-static int stegfirst=1;
+
+// The codecs are created once per process, pthread_once makes that safe when
+// the routines below are called from several threads at the same time
+static pthread_once_t rs_once=PTHREAD_ONCE_INIT;
+
+static void init_rs_codecs(void)
+{
+  rs=init_rs_int(6,0x43,3,1,51,0);
+  rssteg=init_rs_int(6,0x43,1,1,8,43);
+}
 
 #ifdef CVF
 void __stdcall RS_ENCODE(int *dgen, int *sent)
@@ -44,12 +52,8 @@ void rs_encode_(int *dgen, int *sent)
   int dat1[12];
   int b[51];
   int i;
-  if(first) {
-    // Initialize the JT65 codec
-    rs=init_rs_int(6,0x43,3,1,51,0);
-//    puts("first inited");
-    first=0;
-  }
+  // Initialize the JT65 codec
+  pthread_once(&rs_once,init_rs_codecs);
 
   // Reverse data order for the Karn codec.
   for(i=0; i<12; i++) {
@@ -79,10 +83,7 @@ void rs_decode_(int *recd0, int *era0, int *numera0, int *decoded, int *nerr)
   int era_pos[50];
   int recd[63];
 
-  if(first) {
-    rs=init_rs_int(6,0x43,3,1,51,0);
-    first=0;
-  }
+  pthread_once(&rs_once,init_rs_codecs);
 
   numera=*numera0;
   for(i=0; i<12; i++) recd[i]=recd0[62-i];
@@ -119,11 +120,8 @@ void rs_stegencode_(int *dgen, int *sent)
   int dat1[12];
   int b[8];
   int i;
-  if(stegfirst) {
-    // Initialize the JT65 codec
-    rssteg=init_rs_int(6,0x43,1,1,8,43);
-    stegfirst=0;
-  }
+  // Initialize the JT65 codec
+  pthread_once(&rs_once,init_rs_codecs);
 
   // Reverse data order for the Karn codec.
   for(i=0; i<12; i++) {
@@ -152,10 +150,7 @@ void rs_stegdecode_(int *recd0, int *era0, int *numera0, int *decoded, int *nerr
   int era_pos[20];
   int recd[20];
 
-  if(stegfirst) {
-    rssteg=init_rs_int(6,0x43,1,1,8,43);
-    stegfirst=0;
-  }
+  pthread_once(&rs_once,init_rs_codecs);
 
   numera=*numera0;
   for(i=0; i<12; i++) recd[i]=recd0[19-i];
@@ -0,0 +1,78 @@
+#!/usr/bin/python
+#
+# Unit tests for jt65codec.py
+#
+# Copyright 2014 - Paul Drapeau and Brent Dukes
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import unittest
+
+import numpy as np
+import jt65wrapy as jt
+import jt65codec as jc
+
+
+def adderrors(packets, maxerrors, seed):
+# returns a copy of packets with between 0 and maxerrors random symbol errors in each one
+    rand = np.random.RandomState(seed)
+    packets = packets.copy()
+    for packet in packets:
+        positions = rand.permutation(packet.shape[0])[:rand.randint(0, maxerrors + 1)]
+        packet[positions] = (packet[positions] + rand.randint(1, 64, len(positions))) % 64
+    return packets
+
+
+class TestCodecFunctions(unittest.TestCase):
+
+    def setUp(self):
+        self.messages = np.random.RandomState(1).randint(0, 64, (2000, 12)).astype(np.int32)
+
+    def test_PrepMsg(self):
+        msg = jt.encode("KB2BBC KA1AAB DD44")
+        self.assertEqual(jc.prepmsg(msg).tolist(), jt.prepmsg(msg).tolist())
+        self.assertEqual(jc.prepmsg_batch(self.messages).tolist(), jt.prepmsg_batch(self.messages).tolist())
+
+    def test_UnprepMsg(self):
+        packets = jt.prepmsg_batch(self.messages)
+        received = adderrors(packets, 40, 2)  # well past the 25 errors RS(63,12) can correct
+        receivedcopy = received.copy()
+        result, nerr = jc.unprepmsg_batch(received)
+        expectedresult, expectednerr = jt.unprepmsg_batch(received)
+        self.assertEqual(result.tolist(), expectedresult.tolist())
+        self.assertEqual(nerr.tolist(), expectednerr.tolist())
+        self.assertEqual(received.tolist(), receivedcopy.tolist())
+        self.assertTrue((nerr == -1).any())
+        self.assertEqual(jc.unprepmsg(packets[0]).tolist(), self.messages[0].tolist())
+
+    def test_PrepSteg(self):
+        expectedresult = np.array([jt.prepsteg(msg) for msg in self.messages])
+        self.assertEqual(jc.prepsteg(self.messages[0]).tolist(), expectedresult[0].tolist())
+        self.assertEqual(jc.prepsteg_batch(self.messages).tolist(), expectedresult.tolist())
+
+    def test_UnprepSteg(self):
+        received = adderrors(jc.prepsteg_batch(self.messages), 8, 3)
+        result, nerr = jc.unprepsteg_batch(received)
+        expectedresult, expectednerr = jt.unprepsteg_batch(received)
+        self.assertEqual(result.tolist(), expectedresult.tolist())
+        self.assertEqual(nerr.tolist(), expectednerr.tolist())
+        self.assertTrue((nerr == -1).any())
+
+    def test_InterleaveGraycode(self):
+        symbols = np.arange(63)
+        interleaved = jc.interleave63(symbols, 1)
+        self.assertEqual(interleaved[0, :9].tolist(), [0, 7, 14, 21, 28, 35, 42, 49, 56])
+        self.assertEqual(jc.interleave63(interleaved, -1)[0].tolist(), symbols.tolist())
+        self.assertEqual(jc.graycode(jc.graycode(np.arange(64), 1), -1).tolist(), range(64))
@@ -20,6 +20,12 @@
 
 import unittest
 import random
+import subprocess
+import sys
+import itertools
+import os
+import shutil
+import tempfile
 
 import numpy as np
 import jt65stego as jts
@@ -56,6 +62,18 @@ class TestStegFunctions(unittest.TestCase):
             # valid message
             self.assertNotEqual(resultB.tolist(), randomvalidmessage.tolist())
 
+    def test_StegAndUnstegBatch(self):
+        packets = np.random.randint(0, JT65_MAX_SYMBOL + 1, (RANDOM_TEST_LOOP_COUNT, 63))
+        stegmessages = np.random.randint(0, JT65_MAX_SYMBOL + 1, (RANDOM_TEST_LOOP_COUNT, 20))
+        packetscopy = packets.copy()
+        result = jts.jtsteg_batch(packets, stegmessages, hidekey)
+        expectedresult = [jts.jtsteg(packet, stegmessage, hidekey)
+                          for packet, stegmessage in zip(packets, stegmessages)]
+        self.assertEqual(result.tolist(), [packet.tolist() for packet in expectedresult])
+        self.assertEqual(packets.tolist(), packetscopy.tolist())
+        self.assertEqual(jts.jtunsteg_batch(result, hidekey).tolist(), stegmessages.tolist())
+        self.assertEqual(jts.jtunsteg_batch(result[0], hidekey).tolist(), [jts.jtunsteg(result[0], hidekey).tolist()])
+
     def test_RandomCover(self):
         for i in range(63 - len(hidekey)):
             miscount = 0
@@ -68,6 +86,37 @@ class TestStegFunctions(unittest.TestCase):
                     miscount += 1
             self.assertTrue(i == miscount)
 
+    def test_RandomCoverBatch(self):
+        messages = np.array(jts.jt65encodemessages(["KB2BBC KA1AAB DD44", "CQ K1JT FN20"] * 50, False))
+        messagescopy = messages.copy()
+        result = jts.randomcover_batch(messages, 30, 1234)
+        self.assertEqual(messages.tolist(), messagescopy.tolist())
+        self.assertEqual(np.count_nonzero(result != messages, axis=1).tolist(), [30] * 100)
+        self.assertEqual(jts.randomcover_batch(messages, 30, 1234).tolist(), result.tolist())
+        self.assertNotEqual(jts.randomcover_batch(messages, 30, 4321).tolist(), result.tolist())
+
+        rand = np.random.RandomState(1234)
+        self.assertEqual(jts.randomcover_batch(messages, 30, rand).tolist(), result.tolist())
+        self.assertNotEqual(jts.randomcover_batch(messages, 30, rand).tolist(), result.tolist())
+
+        result = jts.randomcover_batch(messages, 63 - len(hidekey), 7, hidekey)
+        self.assertEqual(result[:, hidekey].tolist(), messages[:, hidekey].tolist())
+        self.assertTrue((np.delete(result, hidekey, axis=1) != np.delete(messages, hidekey, axis=1)).all())
+        self.assertEqual(jts.randomcover_batch([], 10).shape, (0, 63))
+
+    def test_EncodeMessagesStream(self):
+        jt65msgs = ["KB2BBC KA1AAB DD44", "KA1AAB KB2BBC DD44", "CQ K1JT FN20", "QRZ K1JT"] * 25
+        expected = [packet.tolist() for packet in jts.jt65encodemessages(jt65msgs)]
+        for workers in (1, 2):
+            result = jts.jt65encodemessages_stream(iter(jt65msgs), workers=workers, chunksize=7)
+            self.assertEqual([packet.tolist() for packet in result], expected)
+        self.assertEqual([packet.tolist() for packet in jts.jt65encodemessages(jt65msgs, False, 2)], expected)
+
+        endless = jts.jt65encodemessages_stream(itertools.cycle(jt65msgs), workers=2, chunksize=7)
+        self.assertEqual([packet.tolist() for packet in itertools.islice(endless, 150)], (expected * 2)[:150])
+        endless.close()
+        self.assertEqual(list(jts.jt65encodemessages_stream([], workers=2)), [])
+
     def test_GetNoiseKey(self):
         result = jts.getnoisekey("Give me a noise key!")
         expectedresult = np.array(
@@ -76,6 +125,24 @@ class TestStegFunctions(unittest.TestCase):
         for i in range(len(result)):
             self.assertTrue(result[i], expectedresult.tolist()[i])
 
+    def test_HideKey(self):
+        result = jts.getnoisekey("Give me a noise key!")
+        expectedresult = [49, 45, 55, 6, 15, 27, 9, 33, 58, 8, 7, 14, 23, 35, 48, 44, 43, 18, 37, 32]
+        self.assertEqual(result, expectedresult)
+        self.assertTrue(jts.getnoisekey("Give me a noise key!") is result)
+        self.assertEqual(result.positions.tolist(), expectedresult)
+        self.assertEqual(np.flatnonzero(result.mask).tolist(), sorted(expectedresult))
+        self.assertEqual(sorted(result.cover.tolist() + expectedresult), range(63))
+        self.assertEqual(result.variant(12), expectedresult[:12])
+        self.assertEqual(result.variant(12), jts.getnoisekey("Give me a noise key!", 12))
+        self.assertEqual(result.variant(12).variant(20), result)
+
+        packet = np.random.randint(0, JT65_MAX_SYMBOL + 1, 63)
+        stegmessage = np.random.randint(0, JT65_MAX_SYMBOL + 1, 20)
+        stegged = jts.jtsteg(packet, stegmessage, result)
+        self.assertEqual(stegged.tolist(), jts.jtsteg(packet, stegmessage, expectedresult).tolist())
+        self.assertEqual(jts.jtunsteg(stegged, result).tolist(), jts.jtunsteg(stegged, expectedresult).tolist())
+
     def test_Pack(self):
         bytes = [255, 0, 0, 0, 0, 0, 0, 0, 0]
         expectedresult = np.array(
@@ -138,6 +205,18 @@ class TestStegFunctions(unittest.TestCase):
             self.assertEqual(len(randombytes), len(swappedbytes))
             self.assertNotEqual(randombytes.tolist(), swappedbytes.tolist())
 
+    def test_PackUnpackBatch(self):
+        randomJT65bytes = np.random.randint(0, JT65_MAX_SYMBOL + 1, (RANDOM_TEST_LOOP_COUNT, 12))
+        randombytes = np.random.randint(0, 256, (RANDOM_TEST_LOOP_COUNT, 9))
+        byteresult = jts.jt65tobytes_batch(randomJT65bytes)
+        self.assertEqual(byteresult.tolist(), [jts.jt65tobytes(msg).tolist() for msg in randomJT65bytes])
+        self.assertEqual(jts.bytestojt65_batch(byteresult).tolist(), randomJT65bytes.tolist())
+        self.assertEqual(jts.bytes8tojt65_batch(byteresult[:, 1:], byteresult[:, 0]).tolist(),
+                         randomJT65bytes.tolist())
+        self.assertEqual(jts.bytestojt65_batch(randombytes).tolist(),
+                         [jts.bytestojt65(np.copy(msg)).tolist() for msg in randombytes])
+        self.assertEqual(jts.jt65tobytes_batch(jts.bytestojt65_batch(randombytes)).tolist(), randombytes.tolist())
+
     def test_JT65EncodeMessages(self):
         msgs = ["KB2BBC KA1AAB DD44", "KA1AAB KB2BBC DD44",
                 "KB2BBC KA1AAB DD44", "KA1AAB KB2BBC DD44", "KB2BBC KA1AAB DD44"]
@@ -373,3 +452,147 @@ class TestStegFunctions(unittest.TestCase):
         result = jts.deciphersteg(
             stegdata, "AES", "AES is totes secure, right? Yeah", "ECB", False)
         self.assertEqual(result.rstrip(), "DEF CON 22")
+
+    def test_LazyImports(self):
+        # a fresh interpreter so modules loaded by the other tests don't count
+        loaded = subprocess.check_output([sys.executable, "-c",
+                                          "import sys, jt65stego, jt65sound, jt65analysis\n"
+                                          "print ' '.join(sorted(name.split('.')[0] for name in sys.modules))"]).split()
+        for module in ["Crypto", "gnupg", "matplotlib", "colorama", "jt65soundlookup"]:
+            self.assertNotIn(module, loaded)
+
+    def test_ReassembleSteg(self):
+        cipherbytes = np.random.randint(0, 256, (3, 8))
+        stegdata = jts.bytes8tojt65_batch(cipherbytes, [0x80 | 3, 1, 0x40 | 5])
+        expectedresult = str(bytearray(cipherbytes.ravel().tolist()))
+        self.assertEqual(str(jts.reassemblesteg(jts.bytes8tojt65_batch(cipherbytes, [0x80 | 3, 1, 2]), "AES")),
+                         expectedresult)
+        self.assertEqual(str(jts.reassemblesteg(stegdata, "XOR")), expectedresult[:21])  # last packet holds 5 bytes
+        self.assertEqual(str(jts.reassemblesteg([], "XOR")), "")
+
+    def test_ReassembleStegShuffled(self):
+        # packets are placed by the number in their status byte, not the order they arrive in
+        rand = np.random.RandomState(5)
+        cipherbytes = rand.randint(0, 256, (100, 8))
+        stegdata = jts.bytes8tojt65_batch(cipherbytes, [0x80 | 100] + range(1, 100))
+        order = rand.permutation(100)
+        expectedresult = str(bytearray(cipherbytes.ravel().tolist()))
+        self.assertEqual(str(jts.reassemblesteg(stegdata[order], "AES")), expectedresult)
+
+        stegdata = jts.bytes8tojt65_batch(cipherbytes[:8], [0x80 | 8] + range(1, 7) + [0x40 | 3])
+        order = [0, 2, 1, 7, 4, 3, 6, 5]
+        self.assertEqual(str(jts.reassemblesteg(stegdata[order], "XOR")), expectedresult[:59])
+        self.assertEqual(str(jts.reassemblesteg(stegdata[order[::-1]], "OTP")), expectedresult[:59])
+
+        ciphermsgs = jts.createciphermsgs(
+            4, "DEF CON 22 STEG IN ANY ORDER", "AES", "AES is totes secure, right? Yeah", "", "ECB", False)
+        result = jts.deciphersteg(ciphermsgs[::-1], "AES", "AES is totes secure, right? Yeah", "ECB", False)
+        self.assertEqual(result.rstrip(), "DEF CON 22 STEG IN ANY ORDER")
+
+    def test_MaxPacketRoundTrip(self):
+        # 128 packets leave the packet count in the first status byte as 0
+        key = "AES is totes secure, right? Yeah"
+        for cipher, aesmode, length in [("AES", "ECB", 1016), ("AES", "CBC", 1000), ("ARC4", "", 1024)]:
+            message = ("DEFCONFTW " * 103)[:length - 1] + "!"
+            ciphermsgs = jts.createciphermsgs(128, message, cipher, key, "", aesmode, False)
+            self.assertEqual(len(ciphermsgs), 128)
+            self.assertEqual(jts.deciphersteg(ciphermsgs, cipher, key, aesmode, False).rstrip(), message)
+
+    def test_ScreenSteg(self):
+        jt65msgs = ["KB2BBC KA1AAB DD44", "KA1AAB KB2BBC DD44", "CQ K1JT FN20"]
+        packets = np.array(jts.jt65encodemessages(jt65msgs, False))
+        received = packets.copy()
+        received[0, hidekey[:10]] = (received[0, hidekey[:10]] + 1) % 64  # 10 errors on the key
+        received[1, [0, 62]] = (received[1, [0, 62]] + 1) % 64  # 2 errors off the key
+        received[2] = np.random.RandomState(7).randint(0, 64, 63)  # can not be decoded
+        errors, keyerrors, nerr = jts.screensteg(received, hidekey)
+        self.assertEqual(errors.shape, (3, 63))
+        self.assertEqual(np.flatnonzero(errors[0]).tolist(), sorted(hidekey[:10]))
+        self.assertEqual(np.flatnonzero(errors[1]).tolist(), [0, 62])
+        self.assertFalse(errors[2].any())
+        self.assertEqual(keyerrors.tolist(), [10, 0, 0])
+        self.assertEqual(nerr.tolist(), [10, 2, -1])
+        decoded = jts.decodemessages(received[:2], False)
+        for i in range(2):
+            self.assertEqual(jts.validatesteg(decoded[i], received[i], hidekey, 10), keyerrors[i] >= 10)
+
+    def test_CipherRegistry(self):
+        cipherobj = jts.getcipher("ARC4", "key one")
+        self.assertTrue(isinstance(cipherobj, jts.ARC4Cipher))
+        self.assertTrue(jts.getcipher("ARC4", "key one") is cipherobj)
+        self.assertFalse(jts.getcipher("ARC4", "key two") is cipherobj)
+        self.assertEqual(jts.getcipher("NOPE", "key one"), None)
+        self.assertEqual(jts.createciphermsgs(2, "HI", "NOPE", "", "", "ECB"), None)
+
+        # The reused cipher object starts every message afresh
+        first = jts.createciphermsgs(2, "DEFCONFTW", "ARC4", "key one", "", "ECB")
+        second = jts.createciphermsgs(2, "DEFCONFTW", "ARC4", "key one", "", "ECB")
+        self.assertEqual([msg.tolist() for msg in first], [msg.tolist() for msg in second])
+        for i in range(2):
+            self.assertEqual(jts.deciphersteg(first, "ARC4", "key one", "ECB"), "DEFCONFTW       ")
+
+        class ReverseCipher(jts.StegCipher):
+            name = "REVERSE"
+            maxbytes = 16
+
+            def encrypt(self, stegmsg):
+                return self.pad(stegmsg)[::-1]
+
+            def decrypt(self, cipherdata):
+                return str(cipherdata)[::-1]
+
+        jts.CIPHERS["REVERSE"] = ReverseCipher
+        try:
+            ciphermsgs = jts.createciphermsgs(2, "PLUGGED IN", "REVERSE", "", "", "ECB")
+            self.assertEqual(jts.deciphersteg(ciphermsgs, "REVERSE", "", "ECB"), "PLUGGED IN      ")
+        finally:
+            del jts.CIPHERS["REVERSE"]
+
+    def test_GPGSession(self):
+        home = tempfile.mkdtemp()
+        try:
+            session = jts.GPGSession(home)
+            keyinput = session.gpg.gen_key_input(key_type="RSA", key_length=1024,
+                                                 name_email="jt65stego@example.com", no_protection=True)
+            self.assertTrue(session.gpg.gen_key(keyinput).fingerprint)
+
+            cipherdata = session.encrypt("HELLO GPG", "jt65stego@example.com")
+            self.assertTrue(cipherdata.startswith("-----BEGIN PGP MESSAGE-----"))
+            self.assertEqual(session.decrypt(cipherdata), "HELLO GPG")
+            self.assertEqual(session.decrypt("not a gpg message"), "")
+
+            # The GPG cipher works through the session of the gnupghome keyring
+            jts.gnupghome = home
+            jts.cipherobjs.clear()
+            self.assertTrue(jts.getgpgsession(home) is jts.getgpgsession(home))
+            ciphermsgs = jts.createciphermsgs(100, "DEFCONFTW", "GPG", "", "jt65stego@example.com", "ECB")
+            stegdata = [np.copy(msg) for msg in ciphermsgs]
+            self.assertEqual(jts.deciphersteg(stegdata, "GPG", "", "ECB").strip(), "DEFCONFTW")
+            self.assertTrue(jts.getcipher("GPG", "", "ECB").session is jts.getgpgsession(home))
+        finally:
+            jts.gnupghome = None
+            jts.cipherobjs.clear()
+            jts.gpgsessions.pop(home, None)
+            subprocess.call(["gpgconf", "--homedir", home, "--kill", "gpg-agent"])
+            shutil.rmtree(home)
+
+    def test_StegStream(self):
+        stegmsg = "THE QUICK BROWN FOX 0123456789 X" * 40  # far more than 127 packets of 8 bytes
+        for cipher, key, aesmode in [("none", "", "ECB"), ("XOR", "XOR rox", "ECB"), ("ARC4", "ARC4", "ECB"),
+                                     ("AES", "PDOGGTHEDUKEZIP1", "CBC"), ("AES", "PDOGGTHEDUKEZIP1", "CFB"),
+                                     ("OTP", "OTP KEY 12345 " * 100, "ECB")]:
+            chunks = (stegmsg[i:i + 50] for i in range(0, len(stegmsg), 50))
+            packets = list(jts.stegencoder(chunks, cipher, key, aesmode))
+            self.assertTrue(len(packets) > 127)
+            self.assertEqual(''.join(jts.stegdecoder(packets, cipher, key, aesmode)), stegmsg)
+            partial = ''.join(jts.stegdecoder(packets[:50], cipher, key, aesmode))
+            self.assertTrue(len(partial) > 0 and stegmsg.startswith(partial))
+            self.assertEqual(''.join(jts.stegdecoder(packets[1:], cipher, key, aesmode)), "")
+            dropped = ''.join(jts.stegdecoder(packets[:-2] + packets[-1:], cipher, key, aesmode))
+            self.assertTrue(len(dropped) < len(stegmsg) and stegmsg.startswith(dropped))
+
+        self.assertEqual(''.join(jts.stegdecoder(jts.stegencoder("HI", "XOR", "k"), "XOR", "k")), "HI")
+        for length in range(6, 18):  # the last packet holds 0 to 7 bytes
+            self.assertEqual(''.join(jts.stegdecoder(jts.stegencoder("X" * length, "none", ""), "none", "")),
+                             "X" * length)
+        self.assertEqual(len(list(itertools.islice(jts.stegencoder(itertools.repeat("ENDLESS"), "ARC4", "k"), 5))), 5)
@@ -21,8 +21,12 @@
 import unittest
 import random
 import os
+import io
+import wave
+import math
 
 import numpy as np
+from multiprocessing.pool import ThreadPool
 import jt65wrapy as jt
 import jt65sound  # Needed to create wav file to test decodewav()
 
@@ -72,6 +76,21 @@ class TestWrapperFunctions(unittest.TestCase):
         self.assertEqual(result1.tolist(), expectedresult1.tolist())
         self.assertEqual(result2.tolist(), expectedresult2.tolist())
 
+    def test_EncodeBatch(self):
+        msgs = ["KB2BBC KA1AAB DD44", "KA1AAB KB2BBC DD44", "CQ K1JT FN20"]
+        result = jt.encode_batch(msgs)
+        self.assertEqual(result.shape, (3, 12))
+        for i in range(len(msgs)):
+            self.assertEqual(result[i].tolist(), jt.encode(msgs[i]).tolist())
+
+    def test_PrepMsgBatch(self):
+        msgs = np.array([[34, 20, 5, 42, 26, 9, 3, 5, 60, 6, 24, 22],
+                         [34, 16, 49, 31, 2, 9, 16, 22, 41, 38, 24, 22]])
+        result = jt.prepmsg_batch(msgs)
+        self.assertEqual(result.shape, (2, 63))
+        for i in range(len(msgs)):
+            self.assertEqual(result[i].tolist(), jt.prepmsg(msgs[i]).tolist())
+
     def test_UnprepMsg(self):
         msg1 = np.array(
             [39, 19, 16, 44, 29, 13, 58, 19, 13, 14, 20, 44, 17, 20, 25, 31, 46, 2, 29, 35, 56, 17, 11, 20, 39,
@@ -91,6 +110,48 @@ class TestWrapperFunctions(unittest.TestCase):
         self.assertEqual(result1.tolist(), expectedresult1.tolist())
         self.assertEqual(result2.tolist(), expectedresult2.tolist())
 
+    def test_UnprepMsgBatch(self):
+        msgs = np.array(
+            [[39, 19, 16, 44, 29, 13, 58, 19, 13, 14, 20, 44, 17, 20, 25, 31, 46, 2, 29, 35, 56, 17, 11, 20, 39,
+              51, 7, 30, 26, 11, 17, 27, 21, 11, 30, 34, 46, 48, 15, 53, 14, 26, 12, 7, 5, 8, 42, 41, 37, 19,
+              16, 35, 63, 20, 3, 12, 38, 26, 8, 37, 22, 23, 29],
+             [1, 22, 21, 42, 33, 8, 40, 58, 13, 54, 19, 19, 58, 6, 5, 10, 29, 24, 34, 1, 53, 33, 30, 43, 17,
+              51, 29, 38, 52, 58, 55, 9, 49, 50, 24, 61, 0, 52, 51, 20, 25, 58, 15, 41, 53, 48, 6, 57, 10, 25,
+              11, 30, 16, 20, 47, 6, 0, 43, 6, 18, 38, 3, 29]], dtype=np.int32)
+        msgs[1][:5] = (msgs[1][:5] + 1) % 64  # 5 symbol errors in the second packet
+        msgscopy = np.copy(msgs)
+        expectedresult = np.array([[34, 20, 5, 42, 26, 9, 3, 5, 60, 6, 24, 22],
+                                   [34, 16, 49, 31, 2, 9, 16, 22, 41, 38, 24, 22]])
+        result, nerr = jt.unprepmsg_batch(msgs)
+        self.assertEqual(result.tolist(), expectedresult.tolist())
+        self.assertEqual(nerr.tolist(), [0, 5])
+        self.assertEqual(msgs.tolist(), msgscopy.tolist())
+        result, nerr = jt.unprepmsg_batch([])  # a wav file with no decodes
+        self.assertEqual((result.shape, nerr.shape), ((0, 12), (0,)))
+
+    def test_UnprepMsgBatchUncorrectable(self):
+        msgs = np.random.RandomState(6).randint(0, 64, 63)
+        result, nerr = jt.unprepmsg_batch(msgs)
+        self.assertEqual(result.shape, (1, 12))
+        self.assertEqual(nerr.tolist(), [-1])
+
+    def test_UnprepMsgErasures(self):
+        msgs = np.random.RandomState(5).randint(0, 64, (50, 12)).astype(np.int32)
+        packets = jt.prepmsg_batch(msgs)
+        confidence = np.full(packets.shape, 200, dtype=np.int32)
+        rand = np.random.RandomState(6)
+        for packet, packetconfidence in zip(packets, confidence):
+            positions = rand.permutation(63)[:34]  # 30 low confidence errors and 4 more errors
+            packet[positions] = (packet[positions] + rand.randint(1, 64, 34)) % 64
+            packetconfidence[positions[:30]] = rand.randint(0, 100, 30)
+        packetscopy = packets.copy()
+        self.assertTrue((jt.unprepmsg_batch(packets)[1] == -1).all())
+        result, nerr = jt.unprepmsg_batch(packets, confidence)
+        self.assertEqual(result.tolist(), msgs.tolist())
+        self.assertTrue((nerr >= 34).all())
+        self.assertEqual(packets.tolist(), packetscopy.tolist())
+        self.assertEqual(jt.unprepmsg(packets[0], confidence[0]).tolist(), msgs[0].tolist())
+
     def test_PrepSteg(self):
         msg1 = np.array([16, 52, 50, 11, 6, 13, 41, 26, 39, 15, 39, 11])
         msg2 = np.array([20, 36, 39, 11, 59, 23, 28, 16, 53, 8, 57, 0])
@@ -121,6 +182,121 @@ class TestWrapperFunctions(unittest.TestCase):
         self.assertEqual(result1.tolist(), expectedresult1.tolist())
         self.assertEqual(result2.tolist(), expectedresult2.tolist())
 
+    def test_UnprepStegBatch(self):
+        msgs = np.array(
+            [[47, 44, 14, 33, 4, 58, 19, 6, 16, 52, 50, 11, 6, 13, 41, 26, 39, 15, 39, 11],
+             [22, 29, 9, 53, 17, 23, 57, 14, 20, 36, 39, 11, 59, 23, 28, 16, 53, 8, 57, 0]], dtype=np.int32)
+        msgs[0][10] = (msgs[0][10] + 1) % 64  # 1 symbol error in the first packet
+        msgscopy = np.copy(msgs)
+        expectedresult = np.array([[16, 52, 50, 11, 6, 13, 41, 26, 39, 15, 39, 11],
+                                   [20, 36, 39, 11, 59, 23, 28, 16, 53, 8, 57, 0]])
+        result, nerr = jt.unprepsteg_batch(msgs)
+        self.assertEqual(result.tolist(), expectedresult.tolist())
+        self.assertEqual(nerr.tolist(), [1, 0])
+        self.assertEqual(msgs.tolist(), msgscopy.tolist())
+
+    def test_OutputWavFileSamples(self):
+        # the array synthesis gives the samples of the per sample math.sin loop it replaced
+        tones = jt65sound.toneswithsync(jt.prepmsg(jt.encode("KB2BBC KA1AAB DD44")), 2, 137.3)
+        for mode in [0, 1]:
+            data_size, frate = jt65sound.wavformat(mode)
+            framerate = int(frate)
+            wav = io.BytesIO()
+            jt65sound.outputwavfile(wav, tones, mode)
+            samples = np.frombuffer(wav.getvalue()[44:], dtype='<i2')
+            self.assertEqual(len(samples), framerate * 60)
+            self.assertFalse(samples[:framerate].any())
+            self.assertFalse(samples[framerate + 126 * data_size:].any())
+            for index in [0, 1, 2, 63, 125]:
+                start = framerate + index * data_size
+                expected = [int(math.sin(2 * math.pi * tones[index] * (x / frate)) * 1000.0 / 2)
+                            for x in range(data_size)]
+                self.assertTrue(np.abs(samples[start:start + data_size] - expected).max() <= 1)
+
+    def test_ToneTable(self):
+        import jt65soundlookup as jtl
+        table = jtl.gettable()
+        self.assertTrue(isinstance(table, np.memmap))
+        self.assertTrue(jtl.gettable() is table)
+        self.assertEqual(table.dtype, np.int16)
+        self.assertEqual(table.tolist(), jtl.buildtable().tolist())
+
+        # the quick wav file is the same as the one synthesized from the tones
+        msg = jt.prepmsg(jt.encode("KB2BBC KA1AAB DD44"))
+        jt65sound.outputwavfilequick("test_output.wav", msg)
+        quick = open("test_output.wav", "rb").read()
+        jt65sound.outputwavfile("test_output.wav", jt65sound.toneswithsync(msg))
+        synthesized = open("test_output.wav", "rb").read()
+        os.remove("test_output.wav")  # Cleanup!
+        self.assertEqual(quick, synthesized)
+
+    def test_ToneTableCache(self):
+        import jt65soundlookup as jtl
+        cache = jt65sound.ToneTableCache(2)
+        self.assertTrue(cache.get() is jtl.gettable())
+        table = cache.get(2, 137.3, 0)
+        self.assertEqual(table.shape, (65, 4096))
+        self.assertFalse(table.flags.writeable)
+        self.assertTrue(cache.get(2, 137.3, 0) is table)
+        cache.get(4, -50, 1)
+        self.assertEqual((len(cache), cache.hits, cache.misses, cache.evictions), (2, 1, 3, 1))
+
+        # every submode, offset and wav mode gets the same wav file from the quick path
+        msg = jt.prepmsg(jt.encode("KB2BBC KA1AAB DD44"))
+        for m, offset, mode in [(2, 137.3, 0), (4, -50, 1), (1, 0, 0)]:
+            jt65sound.outputwavfilequick("test_output.wav", msg, m, offset, mode)
+            quick = open("test_output.wav", "rb").read()
+            jt65sound.outputwavfile("test_output.wav", jt65sound.toneswithsync(msg, m, offset), mode)
+            synthesized = open("test_output.wav", "rb").read()
+            os.remove("test_output.wav")  # Cleanup!
+            self.assertEqual(quick, synthesized)
+
+    def test_StreamWav(self):
+        class PipeWriter(object):
+            # a file object that can only be written, like a pipe
+            def __init__(self):
+                self.writes = []
+
+            def write(self, data):
+                self.writes.append(str(data))
+
+            def flush(self):
+                pass
+
+        msg = jt.prepmsg(jt.encode("KB2BBC KA1AAB DD44"))
+        for output, mode in [(jt65sound.outputwavfilequick, 1), (jt65sound.outputwavfile, 0)]:
+            tones = msg if output == jt65sound.outputwavfilequick else jt65sound.toneswithsync(msg)
+            pipe = PipeWriter()
+            output(pipe, tones, mode=mode)
+            output("test_output.wav", tones, mode=mode)
+            wav = wave.open("test_output.wav", "r")
+            samples = wav.readframes(wav.getnframes())
+            self.assertEqual(wav.getnframes(), jt65sound.wavformat(mode)[1] * 60)
+            wav.close()
+            self.assertEqual(''.join(pipe.writes), open("test_output.wav", "rb").read())
+            os.remove("test_output.wav")  # Cleanup!
+            self.assertEqual(''.join(pipe.writes[1:]), samples)
+            # never more than one symbol of samples at a time
+            self.assertEqual(max(len(data) for data in pipe.writes[1:]), jt65sound.wavformat(mode)[0] * 2)
+
+    def test_OutputWavFiles(self):
+        packets = jt.prepmsg_batch(jt.encode_batch(["KB2BBC KA1AAB DD44", "KA1AAB KB2BBC DD44", "CQ K1JT FN20"]))
+        filenames = ["test_output-" + str(index).zfill(3) + ".wav" for index in range(3)]
+        try:
+            for workers in (1, 2):
+                results = list(jt65sound.outputwavfiles(filenames, packets, 2, 100.0, 1, workers))
+                self.assertEqual([filename for filename, seconds in results], filenames)
+                self.assertTrue(all(seconds >= 0 for filename, seconds in results))
+                rendered = [open(filename, "rb").read() for filename in filenames]
+                if workers == 1:
+                    expected = rendered
+                self.assertEqual(rendered, expected)
+            jt65sound.outputwavfilequick(filenames[2], packets[2], 2, 100.0, 1)
+            self.assertEqual(open(filenames[2], "rb").read(), expected[2])
+        finally:
+            for filename in filenames:
+                os.remove(filename)  # Cleanup!
+
     def test_DecodeWav(self):
         expectedresult = "KB2BBC KA1AAB DD44"
         msg = np.array(
@@ -133,7 +309,95 @@ class TestWrapperFunctions(unittest.TestCase):
         symbols, confidence, jt65result, s2db, freq, a1, a2 = result[0]
         os.remove("test_output.wav")  # Cleanup!
         self.assertEqual(len(result), 1)
-        self.assertEqual(symbols, msg.tolist())
+        self.assertEqual(symbols.tolist(), msg.tolist())
         self.assertEqual(
-            confidence, [255] * 63)  # 63 symbols with 100% confidence
+            confidence.tolist(), [255] * 63)  # 63 symbols with 100% confidence
         self.assertEqual(jt65result, expectedresult)
+        self.assertEqual(result.dtype, jt.DECODE_DTYPE)
+        self.assertEqual(result[0]['msg'], expectedresult)
+        self.assertEqual(jt.packetsymbols(result[0]).tolist(), msg.tolist())
+
+    def test_DecodeWavRepeated(self):
+        # the in-process decoder must give the same answer every time it is called
+        msg = jt.prepmsg(jt.encode("KB2BBC KA1AAB DD44"))
+        tones = jt65sound.toneswithsync(msg)
+        jt65sound.outputwavfile("test_output.wav", tones)
+        first = jt.decodewav("test_output.wav")
+        second = jt.decodewav("test_output.wav")
+        os.remove("test_output.wav")  # Cleanup!
+        self.assertEqual(len(first), 1)
+        self.assertEqual(first.tobytes(), second.tobytes())
+
+    def test_SimulateSpecific(self):
+        # the analysis simulation takes the decoded records of decodewav
+        import jt65analysis
+        msg = jt.prepmsg(jt.encode("KB2BBC KA1AAB DD44"))
+        jt65sound.outputwavfile("test_output.wav", jt65sound.toneswithsync(msg))
+        packets = jt.decodewav("test_output.wav")
+        os.remove("test_output.wav")  # Cleanup!
+        population = packets.copy()
+        population[0]['symbols'][[3, 20, 41]] = (msg[[3, 20, 41]] + 1) % 64
+        population[0]['confidence'][[3, 20, 41]] = 10
+        for simpacket in [population, jt65analysis.binpacketsbyerror(population, False, 3)[3]]:
+            result = jt65analysis.simulatespecific(packets[0], simpacket, 3)
+            self.assertEqual(len(result[7]), 3)
+            self.assertEqual(result[0].tolist(), population[0]['symbols'].tolist())
+            self.assertEqual(result[1].tolist(), population[0]['confidence'].tolist())
+            self.assertEqual(result[2], packets[0]['msg'])
+        self.assertEqual(packets[0]['symbols'].tolist(), msg.tolist())  # the decoded packet is left alone
+
+    def test_DecodePcm(self):
+        # int16 and float32 buffers in memory decode the same as the wav file they were written to
+        msg = jt.prepmsg(jt.encode("KB2BBC KA1AAB DD44"))
+        tones = jt65sound.toneswithsync(msg)
+        jt65sound.outputwavfile("test_output.wav", tones)
+        expectedresult = jt.decodewav_arrays("test_output.wav")
+        wav = wave.open("test_output.wav", "r")
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+        wav.close()
+        os.remove("test_output.wav")  # Cleanup!
+        for pcm in [samples, samples.astype(np.float32)]:
+            symbols, confidence, stats, msgs = jt.decodepcm(pcm)
+            self.assertEqual(msgs, expectedresult[3])
+            self.assertEqual(symbols.tolist(), [msg.tolist()])
+            self.assertEqual(confidence.tolist(), expectedresult[1].tolist())
+            self.assertEqual(stats.tolist(), expectedresult[2].tolist())
+
+    def test_DecodePcmSilence(self):
+        symbols, confidence, stats, msgs = jt.decodepcm(np.zeros(12000, dtype=np.int16))
+        self.assertEqual(msgs, [])
+        self.assertEqual(symbols.shape, (0, 63))
+
+    def test_SymbolCache(self):
+        cache = jt.SymbolCache(2)
+        msg = "KB2BBC KA1AAB DD44"
+        expectedresult = jt.prepmsg(jt.encode(msg))
+        self.assertEqual(cache.frommessage(msg).tolist(), expectedresult.tolist())
+        self.assertEqual((cache.hits, cache.misses), (0, 1))  # one lookup per frommessage call
+        self.assertEqual(cache.frompayload(jt.encode(msg)).tolist(), expectedresult.tolist())
+        self.assertEqual(cache.frommessage(msg).tolist(), expectedresult.tolist())
+        self.assertEqual((cache.hits, cache.misses, cache.evictions), (2, 1, 0))
+        self.assertFalse(cache.frommessage(msg).flags.writeable)
+        cache.frommessage("KA1AAB KB2BBC DD44")  # two more entries push out the oldest two
+        self.assertEqual((len(cache), cache.evictions), (2, 2))
+        cache.clear()
+        self.assertEqual((len(cache), cache.hits, cache.misses, cache.evictions), (0, 0, 0, 0))
+
+    def test_BatchThreads(self):
+        msgs = np.random.RandomState(4).randint(0, 64, (400, 12)).astype(np.int32)
+        chunks = np.array_split(msgs, 8)
+        expectedpackets = [jt.prepmsg_batch(chunk) for chunk in chunks]
+        expectedmsgs = [jt.encode_batch(["KB2BBC KA1AAB DD44", "CQ K1JT FN20"] * len(chunk)) for chunk in chunks]
+        pool = ThreadPool(4)
+        try:
+            for i in range(5):
+                packets = pool.map(jt.prepmsg_batch, chunks)
+                results = pool.map(jt.unprepmsg_batch, packets)
+                encoded = pool.map(lambda chunk: jt.encode_batch(["KB2BBC KA1AAB DD44", "CQ K1JT FN20"] * len(chunk)),
+                                   chunks)
+                self.assertEqual([p.tolist() for p in packets], [p.tolist() for p in expectedpackets])
+                self.assertEqual([r[0].tolist() for r in results], [c.tolist() for c in chunks])
+                self.assertEqual([e.tolist() for e in encoded], [e.tolist() for e in expectedmsgs])
+        finally:
+            pool.close()
+            pool.join()